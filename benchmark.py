@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import joblib
+from utils.synthetic import generate_tasks, generate_commits, to_script2_records, generate_features, tiny_bert
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Benchmarks of the hot paths on seeded synthetic data, e.g. python benchmark.py --scale 2 --threshold 0.2
+# The results are stored per git commit in benchmark_results.json and compared with the last other commit run at the same
+# scale (or --baseline), a benchmark that got slower by more than the threshold fails the run. Every benchmark is a setup
+# function that gets the scale and returns (function to time, number of repeats), benchmarks whose dependencies are not
+# installed (e.g. spacy or tiktoken) are skipped
+
+def bench_extract_dates(scale, seed):
+    from utils.utils import extract_dates, load_nlp
+    load_nlp()
+    tasks = generate_tasks(int(200 * scale), seed=seed)
+    return lambda: extract_dates(tasks), 3
+
+def bench_add_commits_to_tasks(scale, seed):
+    from utils.utils import add_commits_to_tasks, load_nlp
+    load_nlp()
+    tasks = generate_tasks(int(200 * scale), seed=seed)
+    commits = generate_commits(tasks, int(2000 * scale), seed=seed)
+    runs = iter(range(1000))
+    # A new file every repeat, add_commits_to_tasks loads the file if it exists
+    return lambda: add_commits_to_tasks(tasks, commits, f'add_commits_to_tasks_{next(runs)}.json'), 3
+
+# The same as add_commits_to_tasks on the columnar tables script1 uses
+def bench_match_commits(scale, seed):
+    from utils.task_table import TaskTable, CommitTable
+    from utils.utils import load_nlp
+    load_nlp()
+    tasks = generate_tasks(int(200 * scale), seed=seed)
+    commits = generate_commits(tasks, int(2000 * scale), seed=seed)
+
+    def run():
+        commit_table = CommitTable(commits)
+        table = TaskTable(tasks).match_commits(commit_table)
+        return [table.query_record(row, commit_table) for row in range(len(table)) if len(table.commits(row))]
+    return run, 3
+
+def bench_pack_queries(scale, seed):
+    from utils.queries import pack_queries, enhance_task_query, count_tokens
+    count_tokens('') # tiktoken is imported on first use
+    titles = [task['title'] for task in generate_tasks(int(200 * scale), seed=seed)]
+    return lambda: pack_queries(titles, enhance_task_query, 600), 3
+
+def bench_preprocess_text(scale, seed):
+    from utils.utils import preprocess_text, load_nlp
+    load_nlp() # The spaCy model is loaded on first use, not timed and skipped if it is missing
+    texts = [f"{task['body']} {' '.join(comment['body'] for comment in task['comments'])}" for task in generate_tasks(int(200 * scale), seed=seed)]
+    return lambda: [preprocess_text(text) for text in texts], 3
+
+def bench_get_bert_embeddings(scale, seed):
+    import utils.bert as bert
+    import pandas as pd
+    # Without BERT_MODEL a tiny local BERT is built (needs torch and transformers), so the benchmark downloads nothing
+    if 'BERT_MODEL' not in os.environ:
+        bert.BERT_MODEL = tiny_bert(os.path.abspath('tiny_bert'), seed)
+    tasks = generate_tasks(int(100 * scale), seed=seed)
+    generate_commits(tasks, int(500 * scale), seed=seed)
+    df = pd.DataFrame(to_script2_records(tasks, seed))
+    os.makedirs('bert_results', exist_ok=True)
+
+    # The embeddings cache would be loaded after the first repeat
+    def run():
+        if os.path.exists('bert_results/bert_embeddings.pkl'):
+            os.remove('bert_results/bert_embeddings.pkl')
+        return bert.get_bert_embeddings(df.copy(), n_components=10, columns=["title", "body", "comments", "commitMessages"], method='norm', max_length=128, pipeline={})
+    return run, 3
+
+def bench_remove_redundant_features(scale, seed):
+    from utils.model_utils import remove_redundant_features
+    df, _ = generate_features(int(2000 * scale), n_features=400, seed=seed)
+    df = df.drop(columns=['burnedPoints', 'expectedPoints'])
+    return lambda: remove_redundant_features(df), 3
+
+def bench_find_best_model(scale, seed):
+    from utils.model import find_best_model
+    df, _ = generate_features(int(300 * scale), n_features=30, seed=seed)
+    df = df.drop(columns=['burnedPoints', 'expectedPoints'])
+    return lambda: find_best_model(df), 1
+
+def bench_distribute_tasks(scale, seed):
+    from utils.distrubute_tasks import distribute_tasks
+    from utils.model_utils import feature_matrix
+    from sklearn.ensemble import BaggingClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    df, assignees = generate_features(int(500 * scale), n_assignees=20, n_features=50, seed=seed)
+    train = df.drop(columns=['burnedPoints', 'expectedPoints'])
+    X = feature_matrix(train)
+    model = BaggingClassifier(estimator=DecisionTreeClassifier(max_depth=7), n_estimators=50, random_state=seed).fit(X, train['class'])
+    joblib.dump((model, X.columns.tolist()), 'best_bagged_trees_model.pkl')
+    tasks = df.to_dict(orient='records')
+    return lambda: distribute_tasks(tasks, assignees), 3
+
+# Startup of script2 without a command, the heavy packages are only imported by the commands that use them
+def bench_script2_startup(scale, seed):
+    script = os.path.join(PROJECT_DIR, 'script2.py')
+    return lambda: subprocess.run([sys.executable, script, '--help'], capture_output=True, check=True), 3
+
+BENCHMARKS = {
+    'script2_startup': bench_script2_startup,
+    'extract_dates': bench_extract_dates,
+    'add_commits_to_tasks': bench_add_commits_to_tasks,
+    'match_commits': bench_match_commits,
+    'pack_queries': bench_pack_queries,
+    'preprocess_text': bench_preprocess_text,
+    'get_bert_embeddings': bench_get_bert_embeddings,
+    'remove_redundant_features': bench_remove_redundant_features,
+    'find_best_model': bench_find_best_model,
+    'distribute_tasks': bench_distribute_tasks
+}
+
+# The commit of the project, wherever the benchmark is run from
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_DIR, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+# Time every benchmark in a temporary folder, so the files they write (caches, models, figures) don't touch the project
+def run_benchmarks(names, scale, seed):
+    results = {}
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='benchmark_')
+    os.environ.setdefault('TASK_REPORT_DIR', os.path.join(work_dir, 'figures')) # find_best_model shows a confusion matrix
+    try:
+        os.chdir(work_dir)
+        for name in names:
+            try:
+                func, repeat = BENCHMARKS[name](scale, seed)
+            except (ImportError, OSError) as e: # Missing package or spacy model
+                print(f"{name:<28} skipped ({e})")
+                continue
+
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+            results[name] = {'median': float(np.median(times)), 'min': min(times), 'repeat': repeat}
+            print(f"{name:<28} {results[name]['median']:>10.4f}s (min {results[name]['min']:.4f}s, {repeat} runs)")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+# Last other commit run at the same scale and seed
+def find_baseline(history, commit, scale, seed, baseline=None):
+    if baseline is not None:
+        return baseline if baseline in history else None
+    candidates = [
+        (entry['date'], key) for key, entry in history.items()
+        if key != commit and entry['scale'] == scale and entry['seed'] == seed
+    ]
+    return max(candidates)[1] if candidates else None
+
+def compare(results, baseline_results, threshold):
+    regressions = []
+    print(f"\n{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, result in results.items():
+        if name not in baseline_results:
+            continue
+        before, after = baseline_results[name]['median'], result['median']
+        change = after / before - 1 if before > 0 else 0
+        flag = ' REGRESSION' if change > threshold else ''
+        print(f"{name:<28}{before:>11.4f}s{after:>11.4f}s{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths on synthetic data.')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier of the number of tasks, commits and rows.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data.')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='Run only these benchmarks.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown against the baseline, 0.2 is 20%%.')
+    parser.add_argument('--baseline', type=str, default=None, help='Commit to compare with, default the last other commit.')
+    parser.add_argument('--results', type=str, default='benchmark_results.json', help='File with the results of every commit.')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    print(f"Benchmarking {commit} at scale {args.scale}")
+    results = run_benchmarks(args.only or list(BENCHMARKS), args.scale, args.seed)
+
+    history = {}
+    if os.path.exists(args.results):
+        with open(args.results, 'r') as file:
+            history = json.load(file)
+
+    baseline = find_baseline(history, commit, args.scale, args.seed, args.baseline)
+    regressions = compare(results, history[baseline]['results'], args.threshold) if baseline else []
+    if baseline is None:
+        print("\nNo baseline to compare with")
+
+    # Keep the results of earlier runs of this commit for the benchmarks that were not run now
+    entry = history.get(commit, {})
+    previous = entry.get('results', {}) if entry.get('scale') == args.scale and entry.get('seed') == args.seed else {}
+    history[commit] = {'date': datetime.now().isoformat(timespec='seconds'), 'scale': args.scale, 'seed': args.seed, 'results': {**previous, **results}}
+    with open(args.results, 'w') as file:
+        json.dump(history, file, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks slower than {baseline} by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,17 @@
-from utils.plots.plot_task_info import plot_task_distribution, plot_statusEdits
-from utils.plots.plot_commit_info import plot_commits
-from utils.plots.plot_people_info import plot_people_results, plot_average_points_per_task
-from utils.queries import process_queries, categorize_task_query, enhance_task_query, categorize_commits_query
-from utils.utils import get_tasks, get_commits, add_commits_to_tasks, filter_enhanced_tasks
-
-# Some tasks are deleted, for various reasons e.g. the llm_output, or they are filtered. Option 1 is for enrich, 2 is for task_commits
-def return_all_tasks(original_tasks, filtered_tasks, option):
-    original_task_dict = {task["_id"]: task for task in original_tasks}
-    filtered_task_dict = {task["_id"]: task for task in filtered_tasks}
-
-    # Identify missing tasks
-    missing_tasks = [task for task_id, task in original_task_dict.items() if task_id not in filtered_task_dict]
-
-    # Update missing tasks with empty fields and add to filtered_tasks
-    for task in missing_tasks:
-        if option == 1:
-            task.update({"focus_areas": [], "categories": []})
-        if option == 2:
-            task.update({"commits": []})
-
-        filtered_tasks.append(task)
-    return filtered_tasks
+from utils.plots.report import headless, render_report, wait_for_close
+from utils.queries import process_queries, count_tokens, categorize_task_query, enhance_task_query, categorize_commits_query
+from utils.utils import get_tasks, get_commits, filter_enhanced_tasks
+from utils.profiling import stage
+from utils.sync import sync_exports, mark_processed
+from utils.commit_ranking import rank_commits, ranking_recall
+from utils.task_table import TaskTable, CommitTable
+
+# The stages take and return a TaskTable (utils/task_table.py), the llm answers are joined to its rows by index and the
+# tasks are only turned into dicts at the end of main
 
 # Filter task titles to get only 'Code-Related'
-def get_code_tasks(tasks, file_name):
+@stage()
+def get_code_tasks(table, file_name):
     def validate_task_type(task_type):
         if isinstance(task_type, dict) and all(isinstance(k, str) and isinstance(v, str) for k, v in task_type.items()):
             return list(task_type.items())
@@ -36,7 +24,7 @@ def get_code_tasks(tasks, file_name):
         return title.replace("'", '"')
         return title.replace('"',"'")
 
-    task_titles = [normalize_quotes(task['title']) for task in tasks]
+    task_titles = [normalize_quotes(title) for title in table.titles]
     task_types_list = process_queries(task_titles, categorize_task_query, file_name)
 
     task_type_dict = {
@@ -45,80 +33,76 @@ def get_code_tasks(tasks, file_name):
         for task, task_type in validate_task_type(task_types)
     }
 
-    return [task for task in tasks if task_type_dict.get(normalize_quotes(task['title'])) == 'Code-Related']
+    return table.take([row for row, title in enumerate(task_titles) if task_type_dict.get(title) == 'Code-Related'])
 
-# Add categories and area of focus to tasks
-def enrich_tasks(tasks, file_name):
+# Add categories and area of focus to tasks. Every task with a title of the answer gets it, the ones the llm output lost
+# (or that filter_enhanced_tasks removed) keep empty lists and go after the others
+@stage()
+def enrich_tasks(table, file_name):
     def normalize_quotes(title):
         # return title.replace("'", '"')
         return title.replace('"', "'")
 
-    def update_task_data(task_data, details):
-        task_data.update({
-            'categories': details.get("Categories", []),
-            'focus_areas': details.get("FocusArea", [])
-        })
-        return task_data
-
-    enriched_tasks = []
-    tasks_titles = {normalize_quotes(task['title']): task for task in tasks}
+    rows_by_title = table.rows_by_title(normalize_quotes)
 
-    detailed_task_type_list = process_queries(tasks_titles, enhance_task_query, file_name)
+    detailed_task_type_list = process_queries(list(rows_by_title), enhance_task_query, file_name)
     detailed_task_type_list = filter_enhanced_tasks(detailed_task_type_list) # We lose some tasks from this
 
     # plot_task_distribution(detailed_task_type_list)
+    enriched = {} # Rows in the order of the answers, the ones without an answer follow them
     for detailed_task_type in detailed_task_type_list:
         for title, details in detailed_task_type.items():
-            if title in tasks_titles:
-                enriched_tasks.append(update_task_data(tasks_titles[title], details))
-
-    return return_all_tasks(tasks, enriched_tasks, 1)
-
-# Add information about the possible commits of the task
-def correlate_tasks_with_commits(tasks, commits, file_name):
-    # Filter commits based on combined_llm_output and keep only tasks with commits 
-    def filter_tasks(tasks, combined_llm_output):
-        task_dict = {task['title']: task for task in tasks}
-        filtered_tasks = []
-
-        for output in combined_llm_output:
-            for item in output:
-                title, commit_ids = item['title'], set(item['commit_ids'])
-
-                if title in task_dict:
-                    task = task_dict[title]
-                    task['commits'] = [commit for commit in task['commits'] if commit['commitId'] in commit_ids]
-
-                    if task['commits']:
-                        filtered_tasks.append(task)
-
-        return filtered_tasks
-
-    def combine_tasks_with_commits(filtered_tasks, tasks):
-        task_map = {task['title']: task for task in tasks}
-
-        for task in filtered_tasks:
-            task.pop('keywords', None)
-            task_title = task['title']
-            
-            # Update the task with information from the project task map if it exists
-            if task_title in task_map:
-                task_info = task_map[task_title]
-                task.update(task_info)
-                task['commits'] = task.get('commits', [])
-
-        return filtered_tasks
-
-    combined_llm_output = []
-    tasks_with_commits = add_commits_to_tasks(tasks, commits, f'{file_name}add_commits_to_tasks.json')
+            for row in rows_by_title.get(title, []):
+                table.categories[row] = details.get("Categories", [])
+                table.focus_areas[row] = details.get("FocusArea", [])
+                enriched[row] = True
+
+    return table.take(list(enriched) + [row for row in range(len(table)) if row not in enriched])
+
+# Add information about the possible commits of the task. The candidate commits are ranked against the task first and only
+# the top_k most similar are sent to the llm (top_k=None sends all the candidates). With evaluate_recall the full lists are sent too, to
+# report how many of the commits the llm matches on the full lists the ranking kept. Tasks without matched commits keep an empty list
+# and go after the ones with commits
+@stage()
+def correlate_tasks_with_commits(table, commit_table, file_name, top_k=20, min_score=0.1, evaluate_recall=False):
+    # One answer per task, only the items of the task's own title count
+    def query_commits(tasks, prefix):
+        outputs = []
+        for i, task in enumerate(tasks):
+            output = process_queries([task], categorize_commits_query, f'{prefix}_{i}') if task['commits'] else [] # No candidate left after the ranking
+            outputs.append([item for answer in output for item in answer if isinstance(item, dict) and item.get('title') == task['title']])
+        return outputs
+
+    def prompt_tokens(tasks):
+        return sum(count_tokens(message['content']) for task in tasks if task['commits'] for message in categorize_commits_query([task]))
+
+    # Tasks with candidate commits, in the format of add_commits_to_tasks
+    table.match_commits(commit_table)
+    rows = [row for row in range(len(table)) if len(table.commits(row))]
+    tasks_with_commits = [table.query_record(row, commit_table) for row in rows]
 
     # plot_commits(tasks_with_commits)
-    for i, task in enumerate(tasks_with_commits):
-        llm_output = process_queries([task], categorize_commits_query, f'{file_name}task_{i}')
-        combined_llm_output.extend(llm_output)
-
-    filtered_tasks = filter_tasks(tasks_with_commits, combined_llm_output)
-    return combine_tasks_with_commits(filtered_tasks, tasks)
+    if top_k is None:
+        llm_outputs = query_commits(tasks_with_commits, f'{file_name}task')
+    else:
+        ranked_tasks = rank_commits(tasks_with_commits, top_k, min_score)
+        tokens_before, tokens_after = prompt_tokens(tasks_with_commits), prompt_tokens(ranked_tasks)
+        print(f"Commit prompts: {tokens_after} tokens instead of {tokens_before} ({1 - tokens_after / max(tokens_before, 1):.0%} saved)")
+
+        llm_outputs = query_commits(ranked_tasks, f'{file_name}task_top{top_k}')
+        if evaluate_recall:
+            recall = ranking_recall(ranked_tasks, query_commits(tasks_with_commits, f'{file_name}task'))
+            print(f"Ranking recall against the full lists: {'-' if recall is None else f'{recall:.1%}'}")
+        tasks_with_commits = ranked_tasks
+
+    # Keep the commits the llm matched to every task
+    matched = [[] for _ in range(len(table))]
+    for row, task, output in zip(rows, tasks_with_commits, llm_outputs):
+        commit_ids = {commit_id for item in output for commit_id in item.get('commit_ids', [])}
+        sent = {commit['commitId'] for commit in task['commits']}
+        matched[row] = [index for index in table.commits(row) if commit_table.ids[index] in commit_ids and commit_table.ids[index] in sent]
+    table.set_commits(matched)
+    return table.take([row for row in range(len(table)) if matched[row]] + [row for row in range(len(table)) if not matched[row]])
 
 def main():
     users = {
@@ -130,22 +114,38 @@ def main():
     user_details = users.get(name)
     if user_details:
         id, base_path, git_name = user_details['id'], user_details['base_path'], user_details['git_name']
-        tasks = get_tasks(id)[:10]
+        # Merge the delta exports if there are any and only process the tasks that changed since the last sync
+        changes = sync_exports()
+        tasks = get_tasks(id, ids=changes['tasks']['changed'] if changes else None)[:10]
         print(len(tasks))
         commits = get_commits(git_name)
 
+        commit_table = CommitTable(commits)
+
         # Filter tasks and keep only code tasks
-        code_tasks = get_code_tasks(tasks, f'{base_path}task_type')
+        code_tasks = get_code_tasks(TaskTable(tasks), f'{base_path}task_type')
 
         # Add categories and areas of focus to tasks
         enriched_tasks = enrich_tasks(code_tasks, f'{base_path}detailed_task_type')
 
         # Add commits to tasks
-        tasks_with_commits = correlate_tasks_with_commits(enriched_tasks, commits, base_path)
-        tasks_with_commits = return_all_tasks(enriched_tasks, tasks_with_commits, 2) 
+        tasks_with_commits = correlate_tasks_with_commits(enriched_tasks, commit_table, base_path).to_records(commit_table)
+        # The changed ids stay pending in the sync state until here, so a failed run gets them again. Only the tasks of this
+        # run are cleared, the changes of the other users (or past the first 10) stay pending
+        mark_processed('tasks', [task['_id'] for task in tasks])
 
         # # plot_people_results(tasks_with_commits)
-        input("\nPress Enter to close the graphs...")
+        if headless(): # TASK_REPORT_DIR is set, render every plot to files in parallel
+            from utils.plots.plot_commit_info import plot_commit_frequencies, plot_commit_task_network
+            from utils.plots.plot_people_info import plot_average_points_per_task, plot_progress, plot_average_points_per_category
+            render_report([
+                (plot_progress, (tasks_with_commits,)),
+                (plot_average_points_per_task, (tasks_with_commits,)),
+                (plot_average_points_per_category, (tasks_with_commits,)),
+                (plot_commit_frequencies, (tasks_with_commits,)),
+                (plot_commit_task_network, (tasks_with_commits,))
+            ], title=f'Tasks of {name}')
+        wait_for_close()
     else:
         print(f"No details found for name: {name}")
 
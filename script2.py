@@ -1,66 +1,127 @@
-import pandas as pd
+import argparse
 import json
 import warnings
-from sklearn.preprocessing import OneHotEncoder
-from utils.plots.plot_models import plot_best_model, plot_heatmap_categories, plot_for_key, plot_csv_models, plot_task_assignment
-from utils.bert import get_bert_embeddings, run_bert_for_all_combinations
-from utils.model_utils import process_assignees, balance_dataset, filter_data, normalize_data, remove_redundant_features
-from utils.model import find_best_model
-from utils.distrubute_tasks import distribute_tasks
-import matplotlib.pyplot as plt
+from utils.profiling import stage
+
+# The utils are imported inside the commands, so --help or distribute on a saved model don't load torch, transformers or
+# the plotting libraries. python -m utils.profiling imports script2.py distribute shows what a command imports
+PROCESSED_FILE = 'processed_tasks.pkl'
 
 warnings.filterwarnings("ignore", category=FutureWarning, module="sklearn")
 
 # Categorize 'burnedPoints' into Fast-Medium-Slow
 def categorize_burned_points(x): return 1 if x <= 0.5 else 2 if x <= 2 else 3
 
-def pre_process_data(df):
+# With fit=False the encoder stored in the pipeline is reused and the new rows are not balanced
+@stage()
+def pre_process_data(df, pipeline=None, fit=True):
+    from utils.model_utils import balance_dataset, filter_data, encode_task_categories
     # Convert burnedPoints to classes
     df['class'] = df['burnedPoints'].apply(categorize_burned_points)
     # plot_heatmap_categories(df)
 
-    # Convert labels to values and join categories, focus_areas, labels if they are lists
-    for col in ['categories', 'focus_areas', 'labels']:
-        df[col] = df[col].apply(lambda x: ','.join(sorted(x)) if isinstance(x, list) else x)
-
-    # One-hot encode the specified columns
-    encoder = OneHotEncoder(sparse_output=False)
-    encoded_df = pd.DataFrame(
-        encoder.fit_transform(df[['categories', 'focus_areas', 'labels']]),
-        columns=encoder.get_feature_names_out()
-    )
-
-    # Combine original dataframe with encoded data and drop the original columns
-    df = pd.concat([df.reset_index(drop=True), encoded_df], axis=1).drop(columns=['categories', 'focus_areas', 'labels'])
+    # Convert labels to values, join categories, focus_areas, labels and one-hot encode them
+    df = encode_task_categories(df, pipeline, fit)
 
     # Balance and filter the dataset
     df = filter_data(df)
 
     # plot_for_key(df, 'burnedPoints')
 
-    return balance_dataset(df)
-
-def process_data(data):
+    return balance_dataset(df) if fit else df
+
+# options are the keyword arguments of find_best_model (comment, num_runs, use_fold_cache). With compare the models in it
+# are also compared by different_models_comparison on n_jobs worker processes
+def process_data(data, compare=None, n_jobs=-1, **options):
+    import pandas as pd
+    from utils.bert import get_bert_embeddings
+    from utils.model import find_best_model, different_models_comparison
+    from utils.model_utils import normalize_data, process_assignees, remove_redundant_features
+    from utils.pipeline import save_pipeline
+    pipeline = {}
     df = pd.DataFrame(data)
-    df = pre_process_data(df)
-    df = normalize_data(df)
-    df = process_assignees(df)
-
-    df = get_bert_embeddings(df, columns=["title", "body", "comments", "commitMessages"], n_components=10, method='norm')
-    df = remove_redundant_features(df)
-    find_best_model(df)
+    df = pre_process_data(df, pipeline)
+    df = normalize_data(df, pipeline)
+    df = process_assignees(df, pipeline)
+
+    df = get_bert_embeddings(df, columns=["title", "body", "comments", "commitMessages"], n_components=10, method='norm', pipeline=pipeline)
+    df = remove_redundant_features(df, pipeline)
+    find_best_model(df, **options)
+    if compare:
+        different_models_comparison(df, compare, options.get('comment', ''), options.get('num_runs', 10), n_jobs, options.get('use_fold_cache', True))
+    save_pipeline(pipeline, df)
     return df
 
-def main():
-    with open('', 'r', encoding='utf-8') as file: # Load the file data that were returned from script 1
-        data = json.load(file)
+# Update the saved model with only the newly accepted tasks. The new rows are projected with the stored encoders and PCA
+# and the bagged trees grow with estimators trained on them. A full retrain on all_data only runs if the new tasks drifted
+def update_data(new_data, all_data=None, n_new_estimators=10, retire_oldest=0):
+    import joblib
+    import pandas as pd
+    from utils.bert import get_bert_embeddings
+    from utils.distrubute_tasks import load_model
+    from utils.incremental import detect_drift, grow_bagged_model
+    from utils.model_utils import normalize_data, process_assignees, remove_redundant_features, feature_matrix
+    from utils.pipeline import load_pipeline
+    pipeline = load_pipeline()
+    model, feature_names = load_model()
+
+    df = pd.DataFrame(new_data)
+    new_assignees = df['assignees'].tolist()
+    df = pre_process_data(df, pipeline, fit=False)
+    df = normalize_data(df, pipeline, fit=False)
+    df = process_assignees(df, pipeline, fit=False)
+    df = get_bert_embeddings(df, pipeline=pipeline, fit=False, **pipeline['bert'])
+    df = remove_redundant_features(df, pipeline, fit=False)
+
+    X_new = feature_matrix(df.reindex(columns=[*feature_names, 'class'], fill_value=0))
+    y_new = df['class']
+
+    is_drift, report = detect_drift(pipeline, X_new, new_assignees)
+    if is_drift:
+        print(f"New tasks are out of distribution: {report}")
+        if all_data is None:
+            print("Pass all_data to retrain from scratch")
+            return None
+        df = process_data(all_data)
+        from utils.profiles import AssigneeProfiles, save_profiles
+        save_profiles(AssigneeProfiles().update(all_data))
+        return df
+
+    grow_bagged_model(model, X_new, y_new, n_new_estimators, retire_oldest)
+    joblib.dump((model, feature_names), 'best_bagged_trees_model.pkl')
+    print(f"Model updated with {len(X_new)} new tasks, it now has {model.n_estimators} estimators")
+    update_profiles(new_data)
+    return model
+
+# Add tasks of script1's output to the saved assignee profiles, they are built from scratch if there are none
+def update_profiles(data):
+    import os
+    from utils.profiles import AssigneeProfiles, PROFILES_FILE, load_profiles, save_profiles
+    profiles = load_profiles() if os.path.exists(PROFILES_FILE) else AssigneeProfiles()
+    save_profiles(profiles.update(data))
+    return profiles
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def train(data_file, assignees, **options):
+    import joblib
+    import pandas as pd
+    from utils.distrubute_tasks import distribute_tasks
+    from utils.profiles import AssigneeProfiles, save_profiles
+    from utils.results_store import RESULTS_DB
+    from utils.plots.report import headless, render_report, wait_for_close
+
+    data = load_json(data_file) # Load the file data that were returned from script 1
+    df = process_data(data, **options)
+    joblib.dump(df, PROCESSED_FILE) # So distribute can run again on the trained model without processing the data
+    profiles = AssigneeProfiles().update(data)
+    save_profiles(profiles)
+    # plot_best_model(load_results())
+
+    # plot_csv_models(RESULTS_DB, 'Dataset')
 
-    df = process_data(data)
-    # plot_best_model(pd.read_csv('bagged_trees_comparisonAll.csv'))
-
-    # plot_csv_models('bagged_trees_comparison.csv', 'Dataset')
-
-    assignees = ["assignee1", "assignee2", "assignee3"]
     assignee_names = {
         "assignee1Id1": "AssigneeName1",
         "assignee1Id2": "AssigneeName2",
@@ -68,10 +129,112 @@ def main():
     }
 
     processed_tasks = df.to_dict(orient='records')
-    task_assignment = distribute_tasks(processed_tasks, assignees)
+    task_assignment = distribute_tasks(processed_tasks, assignees, profiles=profiles)
     # plot_task_assignment(task_assignment, assignee_names, categorize_burned_points)
-    
-    input("\nPress Enter to close the graphs...")
+
+    if headless(): # TASK_REPORT_DIR is set, render every plot to files in parallel
+        from utils.plots.plot_models import plot_heatmap_categories, plot_for_key, plot_csv_models, plot_task_assignment
+        raw = pd.DataFrame(data)
+        raw['class'] = raw['burnedPoints'].apply(categorize_burned_points)
+        render_report([
+            (plot_heatmap_categories, (raw,)),
+            (plot_for_key, (raw, 'burnedPoints')),
+            (plot_csv_models, (RESULTS_DB, 'Dataset')),
+            (plot_task_assignment, (task_assignment, assignee_names, categorize_burned_points))
+        ], title='Model and task assignment')
+    wait_for_close()
+
+# Assign the processed tasks of the last train run (or another pickled frame) with the saved model and the assignee
+# profiles if there are any (without the model the profiles alone are used)
+def distribute(data_file, assignees, strategy, improve_budget, use_profiles=True, n_scenarios=None):
+    import os
+    import joblib
+    from utils.distrubute_tasks import distribute_tasks
+    from utils.profiles import PROFILES_FILE, load_profiles
+
+    processed_tasks = joblib.load(data_file).to_dict(orient='records')
+    profiles = load_profiles() if use_profiles and os.path.exists(PROFILES_FILE) else None
+    task_assignment = distribute_tasks(processed_tasks, assignees, strategy, improve_budget, profiles=profiles, n_scenarios=n_scenarios)
+    for assignee, tasks in task_assignment.items():
+        print(f"{assignee}: {len(tasks)} tasks")
+    return task_assignment
+
+# Add the tasks of script1's output to the index of past tasks, tasks that are already in it are skipped
+def index_tasks(data_file):
+    import os
+    from utils.pipeline import load_pipeline
+    from utils.task_index import TaskIndex, TASK_INDEX_FILE, task_vectors, load_task_index, save_task_index
+
+    tasks = [{**task, 'class': categorize_burned_points(task['burnedPoints'])} for task in load_json(data_file)]
+    index = load_task_index() if os.path.exists(TASK_INDEX_FILE) else TaskIndex()
+    tasks = [task for task in tasks if task.get('_id') not in index.rows]
+    added = index.add(task_vectors(tasks, load_pipeline()), tasks) if tasks else 0
+    save_task_index(index)
+    print(f"Added {added} tasks to the index, it has {len(index)} tasks")
+
+# The k past tasks most similar to a new one, with the points they took and who did them
+def similar_tasks(title, body, k):
+    import time
+    from utils.pipeline import load_pipeline
+    from utils.task_index import task_vectors, load_task_index
+
+    index = load_task_index()
+    vector = task_vectors([{'title': title, 'body': body}], load_pipeline())
+    start = time.perf_counter()
+    neighbours = index.search(vector, k)
+    print(f"{len(neighbours)} most similar of {len(index)} tasks ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    for task in neighbours:
+        print(f"{task['similarity']:.3f}  {task['burnedPoints']} points (class {task['class']})  {', '.join(task['assignees'] or [])}  {task['title']}")
+    return neighbours
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the task duration model and distribute tasks to assignees.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    train_parser = subparsers.add_parser('train', help='Process the output of script1, find the best model and distribute the tasks.')
+    train_parser.add_argument('data', help='Json file returned from script1.')
+    train_parser.add_argument('--assignees', nargs='+', default=["assignee1", "assignee2", "assignee3"])
+    train_parser.add_argument('--comment', type=str, default='', help='A comment about the changes made, saved with the results.')
+    train_parser.add_argument('--runs', type=int, default=1, help='Number of runs with different random splits.')
+    train_parser.add_argument('--jobs', type=int, default=-1, help='Worker processes of the model comparison, -1 uses all cores.')
+    train_parser.add_argument('--compare', nargs='+', default=None, help="Also compare these models, e.g. 'Bagged Trees' 'Medium Tree'.")
+    train_parser.add_argument('--no-fold-cache', action='store_true', help='Fit every fold again instead of reusing the cached ones.')
+
+    update_parser = subparsers.add_parser('update', help='Grow the saved model with newly accepted tasks.')
+    update_parser.add_argument('new_data', help='Json file with the new tasks from script1.')
+    update_parser.add_argument('--all-data', default=None, help='Json file with all tasks, used to retrain if the new tasks drifted.')
+    update_parser.add_argument('--new-estimators', type=int, default=10)
+    update_parser.add_argument('--retire-oldest', type=int, default=0)
+
+    distribute_parser = subparsers.add_parser('distribute', help='Distribute processed tasks with the saved model.')
+    distribute_parser.add_argument('--data', default=PROCESSED_FILE, help='Pickled frame of processed tasks, by default the one of the last train.')
+    distribute_parser.add_argument('--assignees', nargs='+', required=True)
+    distribute_parser.add_argument('--strategy', default='greedy', help='greedy, lpt, hungarian or milp (the last two up to 2000 task-assignee pairs).')
+    distribute_parser.add_argument('--improve-budget', type=float, default=None, help='Seconds of local search after the strategy.')
+    distribute_parser.add_argument('--scenarios', type=int, default=None, help='Simulate the makespan of the assignment over this many scenarios.')
+    distribute_parser.add_argument('--no-profiles', action='store_true', help='Predict every pair with the model, without the assignee profiles.')
+
+    index_parser = subparsers.add_parser('index', help='Add tasks to the nearest-neighbour index of past tasks.')
+    index_parser.add_argument('data', help='Json file returned from script1.')
+
+    similar_parser = subparsers.add_parser('similar', help='Find the past tasks most similar to a new task.')
+    similar_parser.add_argument('title')
+    similar_parser.add_argument('--body', default='')
+    similar_parser.add_argument('-k', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train(args.data, args.assignees, compare=args.compare, n_jobs=args.jobs, comment=args.comment, num_runs=args.runs, use_fold_cache=not args.no_fold_cache)
+    elif args.command == 'update':
+        update_data(load_json(args.new_data), load_json(args.all_data) if args.all_data else None, args.new_estimators, args.retire_oldest)
+    elif args.command == 'distribute':
+        distribute(args.data, args.assignees, args.strategy, args.improve_budget, not args.no_profiles, args.scenarios)
+    elif args.command == 'index':
+        index_tasks(args.data)
+    elif args.command == 'similar':
+        similar_tasks(args.title, args.body, args.k)
+    else:
+        parser.print_help()
 
 if __name__ == "__main__":
     try:
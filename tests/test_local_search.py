@@ -0,0 +1,30 @@
+import time
+import numpy as np
+from utils.local_search import anneal, improve_assignment
+
+# With one assignee there is nowhere to move a task, the starting assignment comes back unchanged
+def test_anneal_single_assignee():
+    times = np.array([[3.0], [1.0], [2.0]])
+    assignment = np.zeros(3, dtype=np.int64)
+    best_assignment, best_makespan, trace, iterations = anneal(times, assignment, time.perf_counter() + 1, seed=0)
+    assert best_assignment.tolist() == [0, 0, 0]
+    assert best_makespan == 6.0
+    assert trace == [(0.0, 6.0)]
+    assert iterations == 0
+
+def test_improve_assignment_single_assignee():
+    times = np.array([[3.0], [1.0], [2.0]])
+    improved = improve_assignment(times, np.zeros(3, dtype=np.int64), time_budget=0.1, n_jobs=1, n_starts=2)
+    assert improved['assignment'].tolist() == [0, 0, 0]
+    assert improved['makespan'] == 6.0
+
+# The search never returns something worse than where it started
+def test_anneal_does_not_get_worse():
+    rng = np.random.default_rng(0)
+    times = rng.uniform(1, 10, size=(40, 4))
+    assignment = np.zeros(40, dtype=np.int64)
+    start_makespan = times[:, 0].sum()
+    best_assignment, best_makespan, _, _ = anneal(times, assignment, time.perf_counter() + 0.2, seed=0)
+    loads = np.bincount(best_assignment, weights=times[np.arange(40), best_assignment], minlength=4)
+    assert best_makespan <= start_makespan
+    assert np.isclose(loads.max(), best_makespan)
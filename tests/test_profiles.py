@@ -0,0 +1,24 @@
+import numpy as np
+from script2 import categorize_burned_points
+from utils.profiles import AssigneeProfiles, CLASSES
+
+# Values between the half points near the thresholds get the class the model is trained on, not the one of their bin
+def test_classes_match_training_labels():
+    points = [0, 0.25, 0.5, 0.6, 0.7, 0.75, 1.9, 2, 2.1, 2.2, 2.25, 3, 12]
+    tasks = [{'assignees': ['a'], 'categories': ['Feature'], 'focus_areas': ['Backend'], 'burnedPoints': p} for p in points]
+    profiles = AssigneeProfiles().update(tasks)
+
+    expected = np.bincount([categorize_burned_points(p) for p in points], minlength=4)[1:]
+    estimate = profiles.estimate('a', ['Feature'], ['Backend'])
+    assert estimate['count'] == len(points)
+    assert [estimate['classes'][c] * len(points) for c in CLASSES] == expected.tolist()
+
+    counts, _, _, _ = profiles.class_array()
+    assert counts[0, 0, 0].tolist() == expected.tolist()
+
+# One task at a time, every value ends up in its training class
+def test_single_values():
+    for points in [0.5, 0.6, 0.7, 2, 2.1]:
+        profiles = AssigneeProfiles().update([{'assignees': ['a'], 'categories': ['c'], 'focus_areas': ['f'], 'burnedPoints': points}])
+        classes = profiles.estimate('a', ['c'], ['f'])['classes']
+        assert classes[categorize_burned_points(points)] == 1.0
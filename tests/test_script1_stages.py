@@ -0,0 +1,45 @@
+import json
+import os
+import pytest
+import script1
+import utils.queries as queries
+import utils.task_table as task_table
+from utils.llm_simulator import answer
+
+# Input tasks and commits with the records the dict-based stages (before the task tables) returned for them, with the llm
+# answered by the simulator. Every title is unique, the old stages merged tasks with the same title
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'script1_stages.json')
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(queries, 'load_or_request_data', lambda all_queries, path, should_write_file=False: [answer(query) for query in all_queries])
+    count_tokens = lambda text, tokenizer_name='cl100k_base': len(text.split())
+    monkeypatch.setattr(queries, 'count_tokens', count_tokens)
+    monkeypatch.setattr(script1, 'count_tokens', count_tokens)
+    # The spaCy model is not needed to compare the stages, the same words were used for the fixture
+    monkeypatch.setattr(task_table, 'preprocess_text', lambda text, max_words=20: ' '.join(text.lower().split()[:max_words]))
+
+def test_stages_match_old_output(offline):
+    with open(FIXTURE) as file:
+        fixture = json.load(file)
+
+    commit_table = script1.CommitTable(fixture['commits'])
+    table = script1.get_code_tasks(script1.TaskTable(fixture['tasks']), 'task_type')
+    table = script1.enrich_tasks(table, 'detailed_task_type')
+    records = script1.correlate_tasks_with_commits(table, commit_table, '').to_records(commit_table)
+
+    assert json.loads(json.dumps(records)) == fixture['expected']
+
+# Tasks with matched commits come first, like the old stages appended the others after them
+def test_tasks_without_commits_go_last(offline):
+    with open(FIXTURE) as file:
+        fixture = json.load(file)
+
+    commit_table = script1.CommitTable(fixture['commits'])
+    table = script1.enrich_tasks(script1.TaskTable(fixture['tasks']), 'detailed_task_type')
+    records = script1.correlate_tasks_with_commits(table, commit_table, '').to_records(commit_table)
+
+    has_commits = [bool(record['commits']) for record in records]
+    assert any(has_commits) and not all(has_commits)
+    assert has_commits == sorted(has_commits, reverse=True)
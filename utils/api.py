@@ -1,21 +1,23 @@
 import os
 from dotenv import load_dotenv
-from groq import Groq
 import json
-import tiktoken
 
 load_dotenv('.env')
 api_key = os.environ.get("GROQ_API_KEY")
+# e.g. GROQ_BASE_URL=http://127.0.0.1:8787 to run against utils/llm_simulator.py offline
+base_url = os.environ.get("GROQ_BASE_URL")
 
 # Count the number of tokens for a given text
 def count_tokens(text, tokenizer_name = 'cl100k_base'):
+    import tiktoken # Imported on first use like groq, so importing the utils stays fast
     encoding = tiktoken.get_encoding(tokenizer_name)
     tokens = encoding.encode(text)
     return len(tokens)
 
 # Call groq and return the output as an object, i could also use llama3-8b-8192
 def groq_call(message, model_name='llama3-70b-8192', max_response_tokens=2048, model_context_window = 8192):
-    client = Groq(api_key=api_key)
+    from groq import Groq
+    client = Groq(api_key=api_key or ('simulator' if base_url else None), base_url=base_url)
     
     # Tokenize the input message to ensure it fits within the allowed limit
     total_input_tokens = sum(count_tokens(item['content']) for item in message)
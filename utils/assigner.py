@@ -0,0 +1,95 @@
+import heapq
+import joblib
+import numpy as np
+from .distrubute_tasks import load_model, predict_time_matrix, adjust_predicted_time
+from .prediction_cache import model_fingerprint
+
+# Place tasks as they arrive instead of redistributing a fixed list. The load of every assignee is kept in a heap with lazy
+# deletion (stale entries are skipped when popped), so each operation costs one batched prediction over A assignees
+# plus O(log A) heap updates. Tasks are the processed feature dicts that distribute_tasks gets
+class OnlineAssigner:
+    def __init__(self, assignees, model=None, feature_names=None, cache=None):
+        if model is None:
+            model, feature_names = load_model()
+        self.model, self.feature_names, self.cache = model, feature_names, cache
+        self.model_hash = model_fingerprint(model, feature_names) if cache is not None else None
+        self.assignees = list(assignees)
+        self.loads = np.zeros(len(self.assignees))
+        self.tasks = {} # task_id -> {'assignee': index, 'times': adjusted times for every assignee, 'classes': predicted classes}
+        self.heap = [(0.0, a) for a in range(len(self.assignees))]
+
+    def set_load(self, a, load):
+        self.loads[a] = load
+        heapq.heappush(self.heap, (load, a))
+
+        # Drop the stale entries once they outnumber the live ones
+        if len(self.heap) > 2 * len(self.assignees) + 32:
+            self.heap = [(load, a) for a, load in enumerate(self.loads)]
+            heapq.heapify(self.heap)
+
+    # Assignee that finishes the task first, assignees are popped in load order only while they can still beat the best one
+    def best_assignee(self, times):
+        fastest = times.min()
+        popped, seen, best, best_finish = [], set(), None, np.inf
+        while self.heap and self.heap[0][0] + fastest < best_finish:
+            load, a = heapq.heappop(self.heap)
+            if load != self.loads[a] or a in seen: # Stale or duplicate entry
+                continue
+            popped.append((load, a))
+            seen.add(a)
+            if load + times[a] < best_finish:
+                best, best_finish = a, load + times[a]
+
+        for entry in popped:
+            heapq.heappush(self.heap, entry)
+        return best
+
+    def place(self, task_id, a):
+        task = self.tasks[task_id]
+        task['assignee'] = a
+        self.set_load(a, self.loads[a] + task['times'][a])
+        return {'task_id': task_id, 'assigned_to': self.assignees[a], 'best_class_estimated': task['classes'][a].item(), 'time': float(task['times'][a])}
+
+    def unplace(self, task_id):
+        task = self.tasks[task_id]
+        a = task['assignee']
+        self.set_load(a, self.loads[a] - task['times'][a])
+
+    def add_task(self, task_id, task):
+        if task_id in self.tasks:
+            raise ValueError(f"Task {task_id} is already assigned")
+        classes = predict_time_matrix([task], self.assignees, self.model, self.feature_names, cache=self.cache, model_hash=self.model_hash)[0]
+        times = np.array([adjust_predicted_time(predicted_class) for predicted_class in classes], dtype=float)
+        self.tasks[task_id] = {'assignee': None, 'times': times, 'classes': classes}
+        return self.place(task_id, self.best_assignee(times))
+
+    # The task is done, its time no longer counts towards the load of its assignee
+    def complete_task(self, task_id):
+        self.unplace(task_id)
+        del self.tasks[task_id]
+
+    # Move a task to the given assignee, or to the one that finishes it first now. The stored predictions are reused
+    def reassign(self, task_id, assignee=None):
+        self.unplace(task_id)
+        a = self.assignees.index(assignee) if assignee is not None else self.best_assignee(self.tasks[task_id]['times'])
+        return self.place(task_id, a)
+
+    def assignment(self):
+        return {task_id: self.assignees[task['assignee']] for task_id, task in self.tasks.items()}
+
+    def makespan(self):
+        return float(self.loads.max(initial=0))
+
+    # Save the state without the model, restore loads it back with the current one
+    def snapshot(self, path):
+        joblib.dump({'assignees': self.assignees, 'loads': self.loads, 'tasks': self.tasks}, path)
+
+    @classmethod
+    def restore(cls, path, model=None, feature_names=None, cache=None):
+        state = joblib.load(path)
+        assigner = cls(state['assignees'], model, feature_names, cache)
+        assigner.tasks = state['tasks']
+        assigner.loads = state['loads']
+        assigner.heap = [(load, a) for a, load in enumerate(assigner.loads)]
+        heapq.heapify(assigner.heap)
+        return assigner
@@ -1,13 +1,14 @@
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from transformers import BertTokenizer, BertModel
-import torch
 from tqdm import tqdm
 import joblib
 import os
 from sklearn.decomposition import PCA
 import itertools
 import re
+from functools import lru_cache
+from .profiling import stage
 
 def run_bert_for_all_combinations(df):
     # Remove all those and keep the above
@@ -26,34 +27,42 @@ def run_bert_for_all_combinations(df):
         print(columns_list)
         get_bert_embeddings(df, n_components=10, columns=columns_list, method='stand')
 
-# Apply pca on bert data
-def apply_pca(df, n_components=10, method='stand'):
+# Apply pca on bert data, with fit=False the scaler and pca stored in the pipeline are reused
+def apply_pca(df, n_components=10, method='stand', pipeline=None, fit=True):
     # Apply PCA to reduce the dimensionality of the embeddings
     embedding_columns = df.columns[df.columns.str.match(r'^\d+$')]  # Assumes embedding columns are named as numbers
-    print(f"Applying PCA on {len(embedding_columns)} embedding columns.")
+    if fit:
+        print(f"Applying PCA on {len(embedding_columns)} embedding columns.")
 
     if len(embedding_columns) == 0:
         print("No embedding columns found for PCA.")
         return df
 
-    # Choose the scaler based on the method
-    if method == 'stand':
-        scaler = StandardScaler()
-        print("Using StandardScaler for standardization.")
-    elif method == 'norm':
-        scaler = MinMaxScaler()
-        print("Using MinMaxScaler for normalization.")
+    if not fit:
+        scaler, pca = pipeline['pca']
+        pca_embeddings = pca.transform(scaler.transform(df[embedding_columns]))
     else:
-        raise ValueError("Invalid method. Choose 'stand' for standardization or 'norm' for normalization.")
-
-    scaled_embeddings = scaler.fit_transform(df[embedding_columns])
-
-    pca = PCA(n_components=n_components)
-    pca_embeddings = pca.fit_transform(scaled_embeddings)
+        # Choose the scaler based on the method
+        if method == 'stand':
+            scaler = StandardScaler()
+            print("Using StandardScaler for standardization.")
+        elif method == 'norm':
+            scaler = MinMaxScaler()
+            print("Using MinMaxScaler for normalization.")
+        else:
+            raise ValueError("Invalid method. Choose 'stand' for standardization or 'norm' for normalization.")
+
+        scaled_embeddings = scaler.fit_transform(df[embedding_columns])
+
+        pca = PCA(n_components=n_components)
+        pca_embeddings = pca.fit_transform(scaled_embeddings)
+
+        if pipeline is not None:
+            pipeline['pca'] = (scaler, pca)
     
     # Create DataFrame for PCA components
     pca_columns = [f'pca_{i}' for i in range(pca_embeddings.shape[1])]
-    pca_df = pd.DataFrame(pca_embeddings, columns=pca_columns, index=df.index)
+    pca_df = pd.DataFrame(pca_embeddings.astype(np.float32), columns=pca_columns, index=df.index)
     
     # Drop the original embedding columns
     df = df.drop(columns=embedding_columns)
@@ -61,12 +70,24 @@ def apply_pca(df, n_components=10, method='stand'):
     # Concatenate the PCA embeddings with the original dataframe
     df = pd.concat([df, pca_df], axis=1)
     
-    print(f"PCA reduced the dimensionality to {pca_df.shape[1]} components.")
+    if fit:
+        print(f"PCA reduced the dimensionality to {pca_df.shape[1]} components.")
     
     return df
 
-# Check if cached embeddings exist, else create bert analyze
-def get_bert_embeddings(df, n_components, columns, method, max_length=512):
+# Name or local path of the BERT model, e.g. BERT_MODEL=/tmp/tiny_bert for a small local one (see synthetic.tiny_bert)
+BERT_MODEL = os.environ.get('BERT_MODEL', 'bert-base-uncased')
+
+# Load pre-trained BERT model and tokenizer once per process. transformers and torch take seconds to import, so they are
+# only imported here when embeddings are really computed (not for cached embeddings or the other script2 commands)
+@lru_cache(maxsize=1)
+def load_bert(name=BERT_MODEL):
+    from transformers import BertTokenizer, BertModel
+    return BertTokenizer.from_pretrained(name), BertModel.from_pretrained(name).eval()
+
+# Check if cached embeddings exist, else create bert analyze. With fit=False the cache is skipped and only the given rows are embedded
+@stage()
+def get_bert_embeddings(df, n_components, columns, method, max_length=512, pipeline=None, fit=True):
     def combine_text_columns(df, columns):
         CLEAN_TEXT = re.compile(r'@\w+|https?://\S+|www\.\S+|[^\w\s.,!?\'-]|_')
         REMOVE_IMAGE_LINKS = re.compile(r'!\[.*?\]\(.*?\)')
@@ -86,26 +107,28 @@ def get_bert_embeddings(df, n_components, columns, method, max_length=512):
 
         df['combined_text'] = df[columns].apply(lambda row: ' '.join(row.dropna().astype(str)), axis=1)
         df['combined_text'] = df['combined_text'].apply(preprocess_text)
-        combined_text_df = df[['combined_text']]
-        combined_text_df.to_csv('combined_text.csv', index=False)
+        if fit:
+            combined_text_df = df[['combined_text']]
+            combined_text_df.to_csv('combined_text.csv', index=False)
         return df
 
     def encode_text(text):
+        import torch
+        tokenizer, model = load_bert(BERT_MODEL)
         inputs = tokenizer(text, return_tensors='pt', max_length=max_length, truncation=True, padding='max_length')
         with torch.no_grad():
             outputs = model(**inputs)
         return outputs.last_hidden_state[:, 0, :].numpy().flatten()
 
-    # Load pre-trained BERT model and tokenizer
-    tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-    model = BertModel.from_pretrained('bert-base-uncased')
-
     cache_file = f"bert_results/bert_embeddings.pkl"
 
     if not columns:
         return df.drop(columns=["comments", "title", "body", "commitMessages"])
 
-    if os.path.exists(cache_file):
+    if pipeline is not None and fit:
+        pipeline['bert'] = {'columns': columns, 'n_components': n_components, 'method': method, 'max_length': max_length}
+
+    if fit and os.path.exists(cache_file):
         combine_text_columns(df.copy(), columns)
         print(f"Loading cached BERT embeddings for {columns}...")
         embeddings_df = joblib.load(cache_file)
@@ -114,7 +137,7 @@ def get_bert_embeddings(df, n_components, columns, method, max_length=512):
         df_combined = combine_text_columns(df.copy(), columns)
 
         # Generate BERT embeddings for the combined text with a progress bar
-        tqdm.pandas(desc="Generating BERT embeddings")
+        tqdm.pandas(desc="Generating BERT embeddings", disable=not fit)
         df_combined['bert_embeddings'] = df_combined['combined_text'].progress_apply(encode_text)
 
         # Convert embeddings into separate columns
@@ -130,7 +153,8 @@ def get_bert_embeddings(df, n_components, columns, method, max_length=512):
         embeddings_df.columns = embeddings_df.columns.astype(str)
 
         # Cache the embeddings
-        joblib.dump(embeddings_df, cache_file)
-        print(f"BERT embeddings cached for {columns}.")
+        if fit:
+            joblib.dump(embeddings_df, cache_file)
+            print(f"BERT embeddings cached for {columns}.")
 
-    return apply_pca(embeddings_df, n_components, method)
+    return apply_pca(embeddings_df, n_components, method, pipeline, fit)
@@ -0,0 +1,60 @@
+import re
+import numpy as np
+
+# Local pre-ranking of the candidate commits of add_commits_to_tasks before categorize_commits_query. Every commit in the
+# date window of a task is a candidate, most of them share no words with the task. The candidates are scored with TF-IDF
+# cosine similarity between the title and keywords of the task and the message and file paths of the commit, and only the
+# top_k with a score of at least min_score are sent to the llm
+SPLIT_PATH = re.compile(r'[/\\._\-]+|(?<=[a-z])(?=[A-Z])')
+
+def task_text(task):
+    return f"{task['title']} {' '.join(task.get('keywords', []))}"
+
+# File paths are split into their folders and words, e.g. src/components/LoginForm.jsx -> src components Login Form jsx
+def commit_text(commit):
+    files = [file['filename'] if isinstance(file, dict) else str(file).split(' ')[-1] for file in commit.get('files', [])]
+    return f"{commit.get('message', '')} {' '.join(SPLIT_PATH.sub(' ', filename) for filename in files)}"
+
+# Similarity of every candidate commit to its task, one array per task. The vocabulary and idf are fitted once on all the
+# tasks and commits, so words that are in most commits (e.g. src, fix) count less than the specific ones
+def score_commits(tasks):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    commit_texts = [commit_text(commit) for task in tasks for commit in task['commits']]
+    task_texts = [task_text(task) for task in tasks]
+    if not commit_texts:
+        return [np.zeros(0) for _ in tasks]
+
+    vectorizer = TfidfVectorizer(sublinear_tf=True, token_pattern=r'(?u)\b[a-zA-Z][a-zA-Z0-9]+\b')
+    commit_vectors = vectorizer.fit_transform(commit_texts + task_texts)
+    task_vectors, commit_vectors = commit_vectors[len(commit_texts):], commit_vectors[:len(commit_texts)]
+
+    scores, start = [], 0
+    for i, task in enumerate(tasks):
+        end = start + len(task['commits'])
+        scores.append((commit_vectors[start:end] @ task_vectors[i].T).toarray().ravel()) # Rows are l2 normalized
+        start = end
+    return scores
+
+# Keep the top_k commits of every task (all with top_k=None) with a score of at least min_score, in their original order.
+# The tasks are copies
+def rank_commits(tasks, top_k=20, min_score=0.1):
+    ranked_tasks = []
+    for task, scores in zip(tasks, score_commits(tasks)):
+        keep = np.argsort(-scores, kind='stable')[:top_k]
+        keep = np.sort(keep[scores[keep] >= min_score])
+        ranked_tasks.append({**task, 'commits': [task['commits'][i] for i in keep]})
+
+    before = sum(len(task['commits']) for task in tasks)
+    after = sum(len(task['commits']) for task in ranked_tasks)
+    print(f"Commit ranking kept {after} of {before} candidate commits (top {top_k}, score >= {min_score})")
+    return ranked_tasks
+
+# Share of the commits the llm matched on the full candidate lists that the ranking kept, llm_output is the combined
+# output of categorize_commits_query ([[{"title", "commit_ids"}]])
+def ranking_recall(ranked_tasks, llm_output):
+    kept = {(task['title'], commit['commitId']) for task in ranked_tasks for commit in task['commits']}
+    matched = [(item['title'], commit_id) for output in llm_output for item in output for commit_id in item.get('commit_ids', [])]
+    if not matched:
+        return None
+    return sum(pair in kept for pair in matched) / len(matched)
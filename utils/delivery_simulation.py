@@ -0,0 +1,47 @@
+import numpy as np
+
+# Monte Carlo makespan of an assignment. Every scenario draws the class of each task from its class probabilities (of the
+# pair it is assigned to) and turns it into time with class_times, the load of an assignee is the sum of its tasks.
+# The scenarios are drawn as float32 arrays in chunks of at most max_cells (scenario x task) values, so 10k tasks x 10k
+# scenarios stays around 60MB. Only the loads of the assignees (scenarios x assignees) are kept
+QUANTILES = (0.5, 0.9, 0.99)
+
+def quantile_report(samples, quantiles=QUANTILES, axis=None):
+    report = {'mean': samples.mean(axis=axis)}
+    report.update({f'p{round(q * 100)}': value for q, value in zip(quantiles, np.quantile(samples, quantiles, axis=axis))})
+    return report
+
+# proba: T x classes probabilities of the assigned pairs, assignment: assignee index of every task, class_times: time of
+# every class (same order as the proba columns). Returns the makespan and per-assignee load distributions
+def simulate_makespan(proba, assignment, n_assignees, class_times, n_scenarios=10000, seed=0, max_cells=2 ** 22, quantiles=QUANTILES, return_samples=False):
+    proba = np.asarray(proba, dtype=np.float64)
+    assignment = np.asarray(assignment)
+    class_times = np.asarray(class_times, dtype=np.float32)
+
+    # Tasks ordered by assignee, so the loads are sums over contiguous column ranges
+    order = np.argsort(assignment, kind='stable')
+    used, starts = np.unique(assignment[order], return_index=True)
+    cumulative = np.cumsum(proba[order] / proba[order].sum(axis=1, keepdims=True), axis=1).astype(np.float32)
+    steps = np.diff(class_times) # The time of class k is class_times[0] + the steps of the thresholds u passed
+
+    rng = np.random.default_rng(seed)
+    loads = np.zeros((n_scenarios, n_assignees), dtype=np.float32)
+    chunk = max(1, max_cells // max(len(order), 1))
+    for start in range(0, n_scenarios if len(order) else 0, chunk):
+        end = min(start + chunk, n_scenarios)
+        u = rng.random((end - start, len(order)), dtype=np.float32)
+        durations = np.full(u.shape, class_times[0], dtype=np.float32)
+        for k, step in enumerate(steps):
+            durations += (u >= cumulative[:, k]) * step
+        loads[start:end, used] = np.add.reduceat(durations, starts, axis=1)
+
+    makespan = loads.max(axis=1)
+    assignee_report = quantile_report(loads, quantiles, axis=0)
+    result = {
+        'n_scenarios': n_scenarios,
+        'makespan': {key: float(value) for key, value in quantile_report(makespan, quantiles).items()},
+        'assignees': [{key: float(value[a]) for key, value in assignee_report.items()} for a in range(n_assignees)]
+    }
+    if return_samples:
+        result['samples'] = {'makespan': makespan, 'loads': loads}
+    return result
@@ -1,6 +1,13 @@
 import heapq
+import time
 import joblib
+import numpy as np
 import pandas as pd
+from .local_search import improve_assignment
+from .prediction_cache import model_fingerprint, task_fingerprints
+from .profiling import stage
+from .profiles import CLASSES
+from .delivery_simulation import simulate_makespan
 
 def load_model():
     return joblib.load('best_bagged_trees_model.pkl')
@@ -17,42 +24,261 @@ def predict_execution_time(task, assignee, model, feature_names):
     task_features = pd.DataFrame([task_with_assignee], columns=feature_names)
     return model.predict(task_features)[0]
 
-# Greedy Algorithm for Task Distribution considering assignee's performance
-def distribute_tasks(tasks, assignees):
-    def adjust_predicted_time(predicted_time):
-        if predicted_time == 1:
-            return 0.25
-        elif predicted_time == 2:
-            return 1.25
-        elif predicted_time == 3:
-            return 2.5
-        return predicted_time  # If it's not 1, 2, or 3, return the original value
-
-    model, feature_names = load_model()
-    
-    # Initialize a dictionary to keep track of the total execution time for each assignee
-    assignee_times = {assignee: 0 for assignee in assignees}
+# Class probabilities of the bagged trees. BaggingClassifier copies X[:, features] for every estimator, when every estimator
+# uses all the features (the default) the trees are averaged directly on X instead, which is the same result without the copies
+def predict_proba(model, X):
+    X = np.asarray(X, dtype=np.float32)
+    all_features = np.arange(X.shape[1])
+    estimators_features = getattr(model, 'estimators_features_', None)
+    if estimators_features is None or any(not np.array_equal(features, all_features) for features in estimators_features):
+        return model.predict_proba(X)
+
+    proba = np.zeros((X.shape[0], len(model.classes_)))
+    for estimator in model.estimators_:
+        proba[:, estimator.classes_.astype(int)] += estimator.predict_proba(X)
+    return proba / len(model.estimators_)
+
+# Predict the class of every (task, assignee) pair as a T x A array. The feature rows of the tasks are built once and only
+# the assignee column is set on copies of them, so all pairs are scored with one predict per chunk of max_rows rows
+# With a PredictionCache only the pairs it doesn't know are predicted, callers that score many times can pass the model_hash
+# Pairs set in skip (T x A) are not predicted and left for the caller. With a prior (T x A x classes of the model) the
+# probabilities of the predictions less confident than min_confidence are multiplied by it before taking the class
+def predict_time_matrix(tasks, assignees, model, feature_names, max_rows=200000, cache=None, model_hash=None, skip=None, prior=None, min_confidence=0.5):
+    base = pd.DataFrame(tasks).reindex(columns=feature_names, fill_value=0).to_numpy(dtype=np.float32)
+    column_index = {name: i for i, name in enumerate(feature_names)}
+    assignee_columns = np.array([column_index.get(assignee, -1) for assignee in assignees])
+
+    n_tasks, n_assignees = len(tasks), len(assignees)
+    predictions = np.empty((n_tasks, n_assignees), dtype=model.classes_.dtype)
+    task_index, assignee_index = np.divmod(np.arange(n_tasks * n_assignees), n_assignees)
+    if skip is not None:
+        keep = ~np.asarray(skip).ravel()
+        task_index, assignee_index = task_index[keep], assignee_index[keep]
+
+    if cache is not None:
+        model_hash = model_hash or model_fingerprint(model, feature_names)
+        fingerprints = task_fingerprints(base)
+        keys = [(model_hash, fingerprints[t], assignees[a]) for t, a in zip(task_index, assignee_index)]
+        cached = [cache.get(key) for key in keys]
+        missing = np.array([value is None for value in cached])
+        for t, a, value in zip(task_index[~missing], assignee_index[~missing], (value for value in cached if value is not None)):
+            predictions[t, a] = value
+        task_index, assignee_index = task_index[missing], assignee_index[missing]
+
+    for start in range(0, len(task_index), max_rows):
+        rows, columns = task_index[start:start + max_rows], assignee_index[start:start + max_rows]
+        X = base[rows]
+        has_column = assignee_columns[columns] >= 0
+        X[np.flatnonzero(has_column), assignee_columns[columns][has_column]] = 1
+        proba = predict_proba(model, X)
+        if prior is not None:
+            low = proba.max(axis=1) < min_confidence
+            proba[low] *= prior[rows[low], columns[low]]
+        predictions[rows, columns] = model.classes_[proba.argmax(axis=1)]
+
+    if cache is not None:
+        for t, a in zip(task_index, assignee_index):
+            cache.put((model_hash, fingerprints[t], assignees[a]), predictions[t, a].item())
+
+    return predictions
+
+# Class probabilities (T x classes of the model) of every task for the assignee it is assigned to
+def predict_assigned_proba(tasks, assignees, assignment, model, feature_names, max_rows=200000):
+    base = pd.DataFrame(tasks).reindex(columns=feature_names, fill_value=0).to_numpy(dtype=np.float32)
+    column_index = {name: i for i, name in enumerate(feature_names)}
+    columns = np.array([column_index.get(assignees[a], -1) for a in assignment], dtype=int)
+    has_column = np.flatnonzero(columns >= 0)
+    base[has_column, columns[has_column]] = 1
+
+    return np.concatenate([predict_proba(model, base[start:start + max_rows]) for start in range(0, len(base), max_rows)] or [np.zeros((0, len(model.classes_)))])
+
+# Strategies take the T x A matrix of adjusted times and return the index of the chosen assignee for every task
+
+# Single pass in input order, each task goes to the assignee whose total time grows the least, the first one wins on ties
+def greedy_assignment(times):
+    loads = np.zeros(times.shape[1])
+    assignment = np.empty(times.shape[0], dtype=int)
+    for t in range(times.shape[0]):
+        best = int(np.argmin(loads + times[t]))
+        assignment[t] = best
+        loads[best] += times[t, best]
+    return assignment
+
+# Longest processing time first: tasks sorted by their fastest time go to the assignee that finishes them first. Assignees are
+# popped from a load heap only while their load plus the task's fastest time can still beat the best one, usually O(log A) per task
+def lpt_assignment(times):
+    heap = [(0.0, a) for a in range(times.shape[1])]
+    fastest = times.min(axis=1)
+    assignment = np.empty(times.shape[0], dtype=int)
+
+    for t in np.argsort(-fastest, kind='stable'):
+        popped, best, best_finish = [], None, np.inf
+        while heap and heap[0][0] + fastest[t] < best_finish:
+            load, a = heapq.heappop(heap)
+            popped.append((load, a))
+            if load + times[t, a] < best_finish:
+                best, best_finish = a, load + times[t, a]
+
+        assignment[t] = best
+        for load, a in popped:
+            heapq.heappush(heap, (best_finish if a == best else load, a))
+    return assignment
+
+# Minimum total time with balanced task counts (Hungarian), every assignee gets ceil(T / A) slots. Only for small instances
+def hungarian_assignment(times):
+    from scipy.optimize import linear_sum_assignment # scipy.optimize is only imported by the exact strategies
+    n_tasks, n_assignees = times.shape
+    slots = -(-n_tasks // n_assignees)
+    rows, columns = linear_sum_assignment(np.repeat(times, slots, axis=1))
+    assignment = np.empty(n_tasks, dtype=int)
+    assignment[rows] = columns // slots
+    return assignment
+
+# Exact minimum makespan with an ILP solved locally by HiGHS: x[t, a] binary, minimize C with sum_t times[t, a] * x[t, a] <= C
+# Only for small instances, if the time limit is hit the best solution found so far is used. Every x is in one row of each
+# constraint, so the constraints are sparse with T * A non-zeros each instead of dense T x T * A and A x T * A matrices
+def milp_assignment(times, time_limit=60):
+    from scipy.optimize import milp, LinearConstraint, Bounds
+    from scipy.sparse import coo_matrix
+    n_tasks, n_assignees = times.shape
+    n_variables = n_tasks * n_assignees + 1 # x flattened by task, then C
+    cost = np.zeros(n_variables)
+    cost[-1] = 1
+
+    x = np.arange(n_tasks * n_assignees)
+    each_task_once = coo_matrix((np.ones(len(x)), (x // n_assignees, x)), shape=(n_tasks, n_variables)).tocsr()
+
+    rows = np.r_[x % n_assignees, np.arange(n_assignees)]
+    columns = np.r_[x, np.full(n_assignees, n_variables - 1)]
+    load_under_makespan = coo_matrix((np.r_[times.ravel(), -np.ones(n_assignees)], (rows, columns)), shape=(n_assignees, n_variables)).tocsr()
+
+    integrality = np.ones(n_variables)
+    integrality[-1] = 0
+    result = milp(
+        cost,
+        constraints=[LinearConstraint(each_task_once, 1, 1), LinearConstraint(load_under_makespan, -np.inf, 0)],
+        integrality=integrality,
+        bounds=Bounds(np.zeros(n_variables), np.r_[np.ones(n_variables - 1), np.inf]),
+        options={'time_limit': time_limit}
+    )
+    if result.x is None:
+        raise ValueError(f"MILP found no assignment: {result.message}")
+    return result.x[:-1].reshape(n_tasks, n_assignees).argmax(axis=1)
+
+STRATEGIES = {
+    'greedy': greedy_assignment,
+    'lpt': lpt_assignment,
+    'hungarian': hungarian_assignment,
+    'milp': milp_assignment
+}
+
+EXACT_STRATEGIES = ('hungarian', 'milp')
+
+# Run a strategy on the time matrix and report its makespan (largest total time of an assignee) and runtime. The exact
+# strategies refuse matrices above max_exact_cells (tasks x assignees), they would take too long and too much memory
+def solve_assignment(times, strategy='greedy', max_exact_cells=2000):
+    if strategy in EXACT_STRATEGIES and times.size > max_exact_cells:
+        raise ValueError(f"{strategy} is only for up to {max_exact_cells} task-assignee pairs, got {times.size}, use greedy or lpt")
+
+    start = time.perf_counter()
+    assignment = STRATEGIES[strategy](times)
+    runtime = time.perf_counter() - start
+
+    loads = np.bincount(assignment, weights=times[np.arange(len(assignment)), assignment], minlength=times.shape[1])
+    return assignment, {'strategy': strategy, 'makespan': float(loads.max(initial=0)), 'total_time': float(loads.sum()), 'runtime': runtime}
+
+# Run all the strategies on the same time matrix, to choose one per planning horizon. The exact ones are skipped above max_exact_cells
+def compare_strategies(times, strategies=STRATEGIES, max_exact_cells=2000):
+    reports = []
+    for strategy in strategies:
+        if strategy in EXACT_STRATEGIES and times.size > max_exact_cells:
+            continue
+        _, report = solve_assignment(times, strategy, max_exact_cells)
+        reports.append(report)
+    return reports
+
+# Convert a predicted class to time
+def adjust_predicted_time(predicted_time):
+    if predicted_time == 1:
+        return 0.25
+    elif predicted_time == 2:
+        return 1.25
+    elif predicted_time == 3:
+        return 2.5
+    return predicted_time  # If it's not 1, 2, or 3, return the original value
+
+# Class of every (task, assignee) pair from the model, with AssigneeProfiles as a fast path and prior: pairs with at least
+# min_count past tasks of the assignee in the categories and focus areas of the task where one class has min_share of
+# them take that class without the model, model predictions below min_confidence are weighted by the profile distribution.
+# Without a saved model every pair takes the most likely class of its profile
+@stage()
+def predict_with_profiles(tasks, assignees, profiles, cache=None, min_count=10, min_share=0.6, min_confidence=0.5):
+    distribution, totals = profiles.pair_distribution(tasks, assignees)
+    profile_classes = np.array(CLASSES)[distribution.argmax(axis=2)]
+    try:
+        model, feature_names = load_model()
+    except FileNotFoundError:
+        print("No saved model, estimating every pair from the assignee profiles")
+        return profile_classes
+
+    fast = (totals >= min_count) & (distribution.max(axis=2) >= min_share)
+    class_index = {c: i for i, c in enumerate(CLASSES)}
+    prior = distribution[:, :, [class_index[c] for c in model.classes_.tolist()]]
+    model_hash = f"{model_fingerprint(model, feature_names)}-{profiles.fingerprint()}" if cache is not None else None
+    predictions = predict_time_matrix(tasks, assignees, model, feature_names, cache=cache, model_hash=model_hash, skip=fast, prior=prior, min_confidence=min_confidence)
+    predictions[fast] = profile_classes[fast]
+    print(f"Assignee profiles: {int(fast.sum())} of {fast.size} pairs estimated without the model")
+    return predictions
+
+# Makespan distribution of an assignment with simulate_makespan, the probabilities of the assigned pairs come from the saved
+# model or, without one, from the assignee profiles
+def simulate_assignment(tasks, assignees, assignment, n_scenarios=10000, profiles=None, seed=0):
+    try:
+        model, feature_names = load_model()
+    except FileNotFoundError:
+        if profiles is None:
+            raise
+        distribution, _ = profiles.pair_distribution(tasks, assignees)
+        proba, classes = distribution[np.arange(len(tasks)), assignment], CLASSES
+    else:
+        proba, classes = predict_assigned_proba(tasks, assignees, assignment, model, feature_names), model.classes_.tolist()
+    return simulate_makespan(proba, assignment, len(assignees), [adjust_predicted_time(c) for c in classes], n_scenarios, seed)
+
+# Task Distribution considering assignee's performance, strategy is one of STRATEGIES
+# With improve_budget (seconds) the result of the strategy is improved with parallel local search. Pass the same
+# PredictionCache to reruns with other assignees or task subsets to only predict the new pairs
+# With n_scenarios the makespan of the chosen assignment is also simulated, to see the risk next to the point estimate
+@stage()
+def distribute_tasks(tasks, assignees, strategy='greedy', improve_budget=None, cache=None, profiles=None, n_scenarios=None):
+    # Predict every (task, assignee) pair at once, the strategies only read from the T x A arrays
+    if profiles is not None:
+        predicted_times = predict_with_profiles(tasks, assignees, profiles, cache=cache)
+    else:
+        model, feature_names = load_model()
+        predicted_times = predict_time_matrix(tasks, assignees, model, feature_names, cache=cache)
+    if cache is not None:
+        print(f"Prediction cache: {cache.stats()}")
+    adjusted_times = np.vectorize(adjust_predicted_time, otypes=[float])(predicted_times)
+
+    assignment, report = solve_assignment(adjusted_times, strategy)
+    print(f"Strategy {report['strategy']}: makespan {report['makespan']}, total time {report['total_time']}, runtime {report['runtime']:.4f}s")
+
+    if improve_budget:
+        improved = improve_assignment(adjusted_times, assignment, time_budget=improve_budget)
+        assignment = improved['assignment']
+        print(f"Local search: makespan {improved['makespan']} after {improve_budget}s")
+
+    if n_scenarios:
+        simulation = simulate_assignment(tasks, assignees, assignment, n_scenarios, profiles)
+        makespan = simulation['makespan']
+        print(f"Simulated makespan over {n_scenarios} scenarios: p50 {makespan['p50']:.2f}, p90 {makespan['p90']:.2f}, p99 {makespan['p99']:.2f}")
     
     # Initialize task assignment dictionary
     task_assignment = {assignee: [] for assignee in assignees}
     
-    # For each task, find the best assignee
-    for task in tasks:
-        best_assignee = None
-        best_score = float('inf')
-        
-        # Evaluate each assignee for the current task
-        for assignee in assignees:
-            predicted_time = predict_execution_time(task, assignee, model, feature_names)
-            adjusted_time = adjust_predicted_time(predicted_time)
-            total_time_with_new_task = assignee_times[assignee] + adjusted_time
-            
-            if total_time_with_new_task < best_score:
-                best_score = total_time_with_new_task
-                best_assignee = assignee
-        
-        # Update the total execution time for the best assignee
-        assignee_times[best_assignee] += adjusted_time
+    for t, task in enumerate(tasks):
+        best = assignment[t]
+        best_assignee = assignees[best]
 
         # Find the original assignee by checking key lengths (assume all assignee IDs have the same length)
         original_assignee = [k for k, v in task.items() if len(k) == 24 and v == 1]
@@ -64,7 +290,7 @@ def distribute_tasks(tasks, assignees):
             'expectedPoints': task['expectedPoints'],
             'class': task['class'],
             'original_assignee': original_assignee,
-            'best_class_estimated': predicted_time
+            'best_class_estimated': predicted_times[t, best].item()
         })
     
     return task_assignment
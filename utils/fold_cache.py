@@ -0,0 +1,99 @@
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from .prediction_cache import model_fingerprint
+
+# Fold-level cache of the grid searches and cross validations of find_best_model and different_models_comparison. Every
+# cell (split, estimator config, fold) keeps its test accuracy and the fingerprint of the model fitted on it, in one jsonl
+# file per dataset fingerprint, so a rerun on byte-identical features only fits the cells it has not seen. Changed features
+# get a new file, the files of the oldest datasets are removed after max_datasets (not with None, e.g. in worker processes)
+FOLD_CACHE_DIR = 'fold_cache'
+
+class FoldCache:
+    def __init__(self, fingerprint, directory=FOLD_CACHE_DIR, max_datasets=5):
+        self.fingerprint = fingerprint
+        self.path = os.path.join(directory, f'{fingerprint}.jsonl') if directory else None
+        self.entries, self.new_entries = {}, []
+        self.hits = self.misses = 0
+
+        if self.path is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.utime(self.path) # Recently used datasets are kept
+            with open(self.path, 'r') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError: # Cut last line of a killed run
+                        continue
+                    self.entries[entry.pop('key')] = entry
+
+        if max_datasets is not None:
+            for path in sorted(glob.glob(os.path.join(directory, '*.jsonl')), key=os.path.getmtime, reverse=True)[max_datasets:]:
+                if path != self.path:
+                    os.remove(path)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.new_entries.append({'key': key, **entry})
+
+    # Append the new cells, entries computed by worker processes can be passed instead
+    def save(self, entries=None):
+        entries = self.new_entries if entries is None else entries
+        if self.path is not None and entries:
+            with open(self.path, 'a') as file:
+                file.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+        for entry in entries:
+            self.entries.setdefault(entry['key'], {key: value for key, value in entry.items() if key != 'key'})
+        if entries is self.new_entries:
+            self.new_entries = []
+
+    def stats(self):
+        return {'cells': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+# Class and every parameter (nested estimators included) of the estimator with params set, hashed
+def estimator_config(estimator, params):
+    estimator = clone(estimator).set_params(**params)
+    config = type(estimator).__name__ + repr(sorted((name, repr(value)) for name, value in estimator.get_params(deep=True).items()))
+    return hashlib.blake2b(config.encode(), digest_size=8).hexdigest()
+
+def take_rows(X, index):
+    return X.iloc[index] if hasattr(X, 'iloc') else X[index]
+
+# Accuracy of every fold like cross_val_score(cv=n_splits) on a classifier, with the cells already in the cache reused.
+# split names the data the folds are made of, e.g. 'run3' for the train part of split seed 3 or 'full' for all of X
+def cached_cv_scores(estimator, params, X, y, split, cache, n_splits=5):
+    config = estimator_config(estimator, params)
+    feature_names = list(X.columns) if hasattr(X, 'columns') else []
+    scores = []
+    for fold, (train, test) in enumerate(StratifiedKFold(n_splits).split(X, y)):
+        key = f'{split}|{config}|{fold}'
+        entry = cache.get(key)
+        if entry is None:
+            model = clone(estimator).set_params(**params).fit(take_rows(X, train), take_rows(y, train))
+            entry = {'score': float(accuracy_score(take_rows(y, test), model.predict(take_rows(X, test)))), 'model': model_fingerprint(model, feature_names)}
+            cache.put(key, entry)
+        scores.append(entry['score'])
+    return np.array(scores)
+
+# GridSearchCV(scoring='accuracy') with cached folds. The best parameters (first of equal mean scores, like GridSearchCV)
+# are refitted on all of X. Returns the refitted model and its parameters
+def cached_grid_search(estimator, param_grid, X, y, split, cache, n_splits=5):
+    candidates = list(ParameterGrid(param_grid))
+    mean_scores = [cached_cv_scores(estimator, params, X, y, split, cache, n_splits).mean() for params in candidates]
+    best_params = candidates[int(np.argmax(mean_scores))]
+    return clone(estimator).set_params(**best_params).fit(X, y), best_params
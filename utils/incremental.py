@@ -0,0 +1,58 @@
+import numpy as np
+from itertools import chain
+from scipy.stats import ks_2samp
+from sklearn.base import clone
+
+# Check if the new tasks are out of distribution compared to the training features stored in the pipeline
+# New assignees can't be represented by the model, a shifted continuous feature is checked with a two sample KS test
+def detect_drift(pipeline, X_new, new_assignees, p_value=0.01, max_drifted_share=0.2):
+    reference = pipeline['reference']
+    unknown_assignees = set(chain.from_iterable(new_assignees)) - set(pipeline['assignees'])
+
+    # Only columns with more than two values are compared, one-hot and assignee columns are skipped
+    continuous_columns = [col for col in reference.columns if reference[col].nunique() > 2]
+    drifted_columns = [
+        col for col in continuous_columns
+        if ks_2samp(reference[col], X_new[col]).pvalue < p_value
+    ]
+
+    drifted_share = len(drifted_columns) / len(continuous_columns) if continuous_columns else 0
+    report = {
+        'unknown_assignees': sorted(unknown_assignees),
+        'drifted_columns': drifted_columns,
+        'drifted_share': drifted_share
+    }
+    return bool(unknown_assignees) or drifted_share > max_drifted_share, report
+
+# Warm start the bagged trees: add estimators trained on bootstrap samples of the new rows and optionally retire the oldest ones
+# The trees are fitted on the class indices of the existing ensemble, so new rows missing a class don't break predict_proba
+def grow_bagged_model(model, X_new, y_new, n_new_estimators=10, retire_oldest=0, random_state=None):
+    rng = np.random.default_rng(random_state)
+    X_new = np.asarray(X_new)
+    y_encoded = np.searchsorted(model.classes_, np.asarray(y_new))
+    n_samples = X_new.shape[0]
+    if model.max_samples is None:
+        sample_size = n_samples
+    elif isinstance(model.max_samples, int):
+        sample_size = min(model.max_samples, n_samples)
+    else:
+        sample_size = max(1, int(model.max_samples * n_samples))
+
+    for _ in range(n_new_estimators):
+        if model.bootstrap:
+            samples = rng.integers(0, n_samples, sample_size)
+        else:
+            samples = rng.permutation(n_samples)[:sample_size]
+        tree = clone(model.estimator_).set_params(random_state=int(rng.integers(np.iinfo(np.int32).max)))
+        tree.fit(X_new[samples], y_encoded[samples])
+        model.estimators_.append(tree)
+        model.estimators_features_.append(np.arange(X_new.shape[1]))
+
+    # Keep at least the new estimators
+    retire_oldest = min(retire_oldest, len(model.estimators_) - n_new_estimators)
+    if retire_oldest > 0:
+        del model.estimators_[:retire_oldest]
+        del model.estimators_features_[:retire_oldest]
+
+    model.n_estimators = len(model.estimators_)
+    return model
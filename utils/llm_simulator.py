@@ -0,0 +1,231 @@
+import argparse
+import ast
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Local stand-in for the Groq chat completions endpoint, so the enrichment of script1 can be load tested offline.
+# It answers the three prompts of queries.py with well-formed json, sleeps a lognormal latency plus the generation time,
+# enforces requests/tokens per minute limits with 429s like Groq and can inject malformed json. Point groq_call at it with
+#   python -m utils.llm_simulator --port 8787 --rpm 30 --tpm 6000
+#   GROQ_BASE_URL=http://127.0.0.1:8787 python script1.py
+CATEGORY_KEYWORDS = {
+    'Bug Fixes': ['fix', 'bug', 'error', 'crash', 'issue', 'broken'],
+    'Testing & Code Review': ['test', 'review', 'qa', 'coverage'],
+    'Optimization': ['optimi', 'performance', 'slow', 'speed', 'cache', 'memory', 'timeout'],
+    'Feature': ['add', 'new', 'feature', 'implement', 'create', 'support'],
+    'Code Refactoring': ['refactor', 'clean', 'restructure', 'rename', 'remove'],
+    'Dependencies': ['dependency', 'upgrade', 'version', 'package', 'bump'],
+    'Documentation & General': ['doc', 'readme', 'guide', 'comment']
+}
+FOCUS_KEYWORDS = {
+    'Frontend': ['ui', 'page', 'button', 'form', 'modal', 'css', 'style', 'layout', 'frontend', 'component', 'mobile', 'chart'],
+    'Backend': ['api', 'endpoint', 'server', 'backend', 'queue', 'worker', 'job', 'email', 'notification'],
+    'DevOps & Cloud': ['deploy', 'docker', 'pipeline', 'ci', 'build', 'release', 'cloud', 'env', 'config'],
+    'Database': ['database', 'db', 'query', 'index', 'migration', 'sql', 'mongo'],
+    'Security': ['security', 'auth', 'token', 'session', 'permission', 'login'],
+    'AI': ['model', 'ai', 'ml', 'llm', 'predict', 'train'],
+    'Embedded': ['embedded', 'firmware', 'device', 'sensor']
+}
+NON_CODE_KEYWORDS = ['meeting', 'call', 'presentation', 'plan', 'newsletter', 'social', 'content', 'write', 'interview', 'publication']
+
+# tiktoken is imported by the first api.count_tokens call, without it about 4 characters per token
+def count_tokens(text):
+    try:
+        from .api import count_tokens as api_count_tokens
+        return api_count_tokens(text)
+    except ImportError:
+        return max(1, len(text) // 4)
+
+def words(text):
+    return set(re.findall(r'[a-z0-9]+', str(text).lower()))
+
+def matches(text, keywords):
+    text_words = words(text)
+    return [name for name, names in keywords.items() if any(word.startswith(keyword) for word in text_words for keyword in names)]
+
+# Stable choice for titles without keywords, the same title always gets the same answer
+def stable_choice(text, options):
+    return options[int(hashlib.md5(text.encode()).hexdigest(), 16) % len(options)]
+
+def parse_items(content, marker):
+    try:
+        return ast.literal_eval(content.split(marker, 1)[1].strip())
+    except (IndexError, ValueError, SyntaxError):
+        return []
+
+# Answer of one prompt of queries.py, the type of the query is recognised from its text
+def answer(messages):
+    content = messages[-1]['content']
+    if 'Areas of Focus:' in content:
+        return {
+            title: {
+                'Categories': matches(title, CATEGORY_KEYWORDS) or [stable_choice(title, list(CATEGORY_KEYWORDS))],
+                'FocusArea': matches(title, FOCUS_KEYWORDS) or [stable_choice(title, list(FOCUS_KEYWORDS))]
+            }
+            for title in parse_items(content, 'The titles are:')
+        }
+    if '"Code-Related"' in content:
+        return {
+            title: 'Non-Code-Related' if words(title) & set(NON_CODE_KEYWORDS) else 'Code-Related'
+            for title in parse_items(content, 'The titles are:')
+        }
+    if 'commits that belong to the task' in content:
+        results = []
+        for task in parse_items(content, 'The tasks are:'):
+            task_words = {word for word in words(task.get('title', '')) | words(task.get('keywords', '')) if len(word) > 2}
+            commit_ids = [
+                commit['commitId'] for commit in task.get('commits', [])
+                if task_words & (words(commit.get('message', '')) | words(commit.get('files', '')))
+            ]
+            results.append({'title': task.get('title', ''), 'commit_ids': commit_ids})
+        return results
+    return {}
+
+class LLMSimulator:
+    def __init__(self, latency=0.5, sigma=0.5, tokens_per_second=300, rpm=30, tpm=6000, rate_limit_rate=0.0, malformed_rate=0.0, seed=0):
+        self.latency, self.sigma, self.tokens_per_second = latency, sigma, tokens_per_second
+        self.rpm, self.tpm = rpm, tpm
+        self.rate_limit_rate, self.malformed_rate = rate_limit_rate, malformed_rate
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.window = deque() # (time, tokens) of the requests of the last minute
+        self.counts = {'requests': 0, 'completed': 0, 'rate_limited': 0, 'malformed': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        self.latencies = deque(maxlen=10000)
+
+    # Seconds until the request fits in the limits of the last minute, 0 if it can run now
+    def admit(self, tokens):
+        with self.lock:
+            now = time.monotonic()
+            self.counts['requests'] += 1
+            while self.window and self.window[0][0] <= now - 60:
+                self.window.popleft()
+
+            used_tokens = sum(window_tokens for _, window_tokens in self.window)
+            if len(self.window) >= self.rpm or (self.window and used_tokens + tokens > self.tpm):
+                self.counts['rate_limited'] += 1
+                return max(0.1, self.window[0][0] + 60 - now)
+            if self.rng.random() < self.rate_limit_rate:
+                self.counts['rate_limited'] += 1
+                return 1.0
+
+            self.window.append((now, tokens))
+            return 0
+
+    def complete(self, body):
+        messages = body.get('messages', [])
+        prompt_tokens = sum(count_tokens(message.get('content', '')) for message in messages)
+        content = json.dumps(answer(messages), indent=2)
+        completion_tokens = count_tokens(content)
+
+        with self.lock:
+            delay = self.latency * self.rng.lognormal(0, self.sigma) + completion_tokens / self.tokens_per_second
+            malformed = self.rng.random() < self.malformed_rate
+        time.sleep(delay)
+
+        if malformed: # Cut answer like a response that hit max_tokens
+            content = content[:len(content) // 2]
+
+        with self.lock:
+            self.counts['completed'] += 1
+            self.counts['malformed'] += malformed
+            self.counts['prompt_tokens'] += prompt_tokens
+            self.counts['completion_tokens'] += completion_tokens
+            self.latencies.append(delay)
+
+        return {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'simulator'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'length' if malformed else 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens}
+        }
+
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+            return {
+                **self.counts,
+                'latency_p50': float(np.percentile(latencies, 50)),
+                'latency_p95': float(np.percentile(latencies, 95)),
+                'tokens_last_minute': sum(tokens for _, tokens in self.window)
+            }
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    simulator = None
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.simulator.stats())
+        else:
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+    # The Groq client posts to /openai/v1/chat/completions
+    def do_POST(self):
+        if not self.path.endswith('/chat/completions'):
+            return self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        except ValueError as e:
+            return self.send_json(400, {'error': {'message': str(e), 'type': 'invalid_request_error'}})
+
+        tokens = sum(count_tokens(message.get('content', '')) for message in body.get('messages', [])) + body.get('max_tokens', 0)
+        retry_after = self.simulator.admit(tokens)
+        if retry_after:
+            return self.send_json(429, {'error': {'message': f'Rate limit reached, please try again in {retry_after:.2f}s', 'type': 'tokens', 'code': 'rate_limit_exceeded'}},
+                                  {'retry-after': f'{retry_after:.2f}'})
+
+        self.send_json(200, self.simulator.complete(body))
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# Run the simulator in a background thread, e.g. for a benchmark in the same process. Returns the server and its url
+def start_simulator(host='127.0.0.1', port=0, **config):
+    SimulatorHandler.simulator = LLMSimulator(**config)
+    server = ThreadingHTTPServer((host, port), SimulatorHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offline simulator of the Groq chat completions endpoint.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8787)
+    parser.add_argument('--latency', type=float, default=0.5, help='Median seconds before the answer starts.')
+    parser.add_argument('--sigma', type=float, default=0.5, help='Sigma of the lognormal latency.')
+    parser.add_argument('--tokens-per-second', type=float, default=300, help='Generation speed of the answer.')
+    parser.add_argument('--rpm', type=int, default=30, help='Requests per minute before 429.')
+    parser.add_argument('--tpm', type=int, default=6000, help='Tokens per minute (prompt and max_tokens) before 429.')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Share of requests that get a random 429.')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Share of answers with cut json.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    SimulatorHandler.simulator = LLMSimulator(args.latency, args.sigma, args.tokens_per_second, args.rpm, args.tpm, args.rate_limit_rate, args.malformed_rate, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), SimulatorHandler)
+    print(f"Simulating the Groq API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,124 @@
+import math
+import time
+import numpy as np
+from joblib import Parallel, delayed, cpu_count
+
+# Indices of the 3 largest loads, enough to know the makespan after any move that changes at most 2 loads
+def top_loads(loads):
+    k = min(3, len(loads))
+    top = np.argpartition(-loads, k - 1)[:k]
+    return top[np.argsort(-loads[top])].tolist()
+
+# Makespan after the loads of a and b change to load_a and load_b, O(1) with the top 3 loads
+def makespan_after(loads, top, a, b, load_a, load_b):
+    others = next((loads[i] for i in top if i != a and i != b), 0.0)
+    return max(load_a, load_b, others)
+
+# One simulated annealing run under a wall-clock deadline. Moves send a task to another assignee, swaps exchange the
+# assignees of two tasks. Every move is evaluated in O(1) from the loads, the cost is the makespan with the sum of squared
+# loads as a small tie breaker so the search can move along plateaus
+def anneal(times, assignment, deadline, seed, start_temperature=None, end_temperature=1e-3, check_every=256):
+    rng = np.random.default_rng(seed)
+    n_tasks, n_assignees = times.shape
+    assignment = assignment.copy()
+    loads = np.bincount(assignment, weights=times[np.arange(n_tasks), assignment], minlength=n_assignees).astype(float)
+    top = top_loads(loads)
+    makespan = loads[top[0]]
+    tie_breaker = 0.1 / max(loads.mean(), 1e-9)
+
+    best_makespan, best_assignment = makespan, assignment.copy()
+    start = time.perf_counter()
+    trace = [(0.0, float(best_makespan))]
+    if n_assignees < 2 or n_tasks == 0: # Nothing to move, there is no other assignee to draw
+        return best_assignment, float(best_makespan), trace, 0
+    start_temperature = start_temperature or float(np.median(times))
+    temperature, iteration = start_temperature, 0
+
+    while True:
+        iteration += 1
+        if iteration % check_every == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            progress = (now - start) / max(deadline - start, 1e-9)
+            temperature = start_temperature * (end_temperature / start_temperature) ** progress
+
+        # Draw a move (task t to assignee b) or a swap (t with u), both change only the loads of a and b
+        t = rng.integers(n_tasks)
+        a = assignment[t]
+        if rng.random() < 0.5:
+            u = -1
+            b = rng.integers(n_assignees - 1)
+            b += b >= a
+            load_a, load_b = loads[a] - times[t, a], loads[b] + times[t, b]
+        else:
+            u = rng.integers(n_tasks)
+            b = assignment[u]
+            if a == b:
+                continue
+            load_a = loads[a] - times[t, a] + times[u, a]
+            load_b = loads[b] - times[u, b] + times[t, b]
+
+        new_makespan = makespan_after(loads, top, a, b, load_a, load_b)
+        delta = (new_makespan - makespan) + tie_breaker * (load_a ** 2 + load_b ** 2 - loads[a] ** 2 - loads[b] ** 2)
+        if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+            continue
+
+        # Accept, only here the top loads are recomputed
+        assignment[t] = b
+        if u >= 0:
+            assignment[u] = a
+        loads[a], loads[b] = load_a, load_b
+        top = top_loads(loads)
+        makespan = loads[top[0]]
+
+        if makespan < best_makespan - 1e-12:
+            best_makespan, best_assignment = makespan, assignment.copy()
+            trace.append((time.perf_counter() - start, float(best_makespan)))
+
+    return best_assignment, float(best_makespan), trace, iteration
+
+# Improve an assignment (e.g. from distribute_tasks) on the T x A time matrix with multi-start simulated annealing across
+# worker processes, all of them stop at the same wall-clock budget. The first start is the given assignment, the others
+# reassign a share of its tasks at random. Returns the best assignment found and a merged convergence trace
+def improve_assignment(times, assignment, time_budget=10, n_starts=None, n_jobs=-1, perturbation=0.1, seed=0):
+    times = np.asarray(times, dtype=float)
+    assignment = np.asarray(assignment)
+    n_tasks, n_assignees = times.shape
+    if n_starts is None:
+        n_starts = cpu_count() if n_jobs < 0 else n_jobs
+
+    rng = np.random.default_rng(seed)
+    starts = [assignment]
+    for _ in range(n_starts - 1):
+        start = assignment.copy()
+        perturbed = rng.random(n_tasks) < perturbation
+        start[perturbed] = rng.integers(n_assignees, size=perturbed.sum())
+        starts.append(start)
+
+    deadline_in = time.time() + time_budget
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(run_start)(times, start, deadline_in, seed + i)
+        for i, start in enumerate(starts)
+    )
+
+    best_assignment, best_makespan, _, _ = min(results, key=lambda result: result[1])
+
+    # Merge the traces of the starts into the best makespan known at each point in time
+    events = sorted((elapsed, makespan) for _, _, trace, _ in results for elapsed, makespan in trace)
+    trace, running_best = [], np.inf
+    for elapsed, makespan in events:
+        if makespan < running_best:
+            running_best = makespan
+            trace.append((elapsed, makespan))
+
+    return {
+        'assignment': best_assignment,
+        'makespan': best_makespan,
+        'trace': trace,
+        'starts': [{'makespan': makespan, 'iterations': iterations} for _, makespan, _, iterations in results]
+    }
+
+# Worker processes don't share perf_counter, so the deadline is passed as wall-clock time
+def run_start(times, assignment, deadline, seed):
+    return anneal(times, assignment, time.perf_counter() + max(0.0, deadline - time.time()), seed)
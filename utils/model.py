@@ -1,20 +1,84 @@
-import csv
-import argparse
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+import hashlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from sklearn.model_selection import train_test_split
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import AdaBoostClassifier, BaggingClassifier
-from imblearn.ensemble import RUSBoostClassifier
 import warnings 
 import joblib
+from joblib import Parallel, delayed
 from sklearn.metrics import classification_report, confusion_matrix, ConfusionMatrixDisplay
+from .model_utils import feature_matrix
+from .results_store import save_result, save_results
+from .fold_cache import FoldCache, FOLD_CACHE_DIR, cached_cv_scores, cached_grid_search
 import matplotlib.pyplot as plt
+from .profiling import stage
+from .plots.report import show
 
 warnings.filterwarnings("ignore", category=FutureWarning, module="sklearn")
 
+# Hash the feature matrix so a checkpoint is only reused for the same data
+def dataset_fingerprint(X, y):
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    digest.update(','.join(map(str, X.shape)).encode())
+    return digest.hexdigest()[:16]
+
+# Run one (model, run) cell of the comparison, X and y are memory-mapped from data_path so they are not pickled to every worker
+# The worker reads the fold cache of the dataset and returns the folds it fitted, the main process appends them to the file
+def evaluate_model_run(name, model, param_grid, run, data_path, fingerprint, cache_dir):
+    start = time.perf_counter()
+    X, y = joblib.load(data_path, mmap_mode='r')
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=run)
+
+    cache = FoldCache(fingerprint, cache_dir, max_datasets=None)
+    best_model, best_params = cached_grid_search(model, param_grid, X_train, y_train, f'run{run}', cache)
+
+    y_pred = best_model.predict(X_test)
+    scores = cached_cv_scores(model, best_params, X, y, 'full', cache)
+
+    return {
+        'model': name,
+        'run': run,
+        'best_params': best_params,
+        'average_cv_score': float(scores.mean()),
+        'scores': scores.tolist(),
+        'report': classification_report(y_test, y_pred),
+        'seconds': time.perf_counter() - start,
+        'fold_cache': cache.new_entries
+    }
+
+# One checkpoint per comment and dataset, so finishing (and removing) one comparison doesn't drop the cells of another
+def checkpoint_path(comment, fingerprint):
+    comment_hash = hashlib.sha256(comment.encode()).hexdigest()[:8]
+    return f'bagged_trees_comparison.{fingerprint}-{comment_hash}.checkpoint.jsonl'
+
+# Load the cells that were already finished for this comment and dataset
+def load_checkpoint(checkpoint_file, comment, fingerprint):
+    completed = {}
+    if not os.path.exists(checkpoint_file):
+        return completed
+
+    with open(checkpoint_file, 'r') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError: # The last line may be cut if the process was killed while writing
+                continue
+            if entry['comment'] == comment and entry['fingerprint'] == fingerprint:
+                completed[(entry['model'], entry['run'])] = entry
+    return completed
+
 # Run different models, with model_name i can choose what models to run e.g ['Bagged Trees', 'Medium Tree'] 
-def different_models_comparison(df, model_names):
+# Every (model, run) pair is scheduled on a process pool, finished cells are checkpointed so an interrupted comparison can be resumed
+def different_models_comparison(df, model_names, comment='', num_runs=10, n_jobs=-1, use_fold_cache=True):
+    from imblearn.ensemble import RUSBoostClassifier # Only this comparison uses imblearn
     # Assuming 'class' is the name of your target variable
-    X = df.drop(columns=['class'])
+    X = feature_matrix(df)
     y = df['class']
 
     # Define hyperparameter grids
@@ -37,57 +101,64 @@ def different_models_comparison(df, model_names):
     models = {name: model for name, model in models.items() if name in model_names}
     param_grids = {name: params for name, params in param_grids.items() if name in model_names}
 
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description='Model evaluation with optional comments.')
-    parser.add_argument('--comment', type=str, default='', help='A comment about the changes made.')
-    parser.add_argument('--runs', type=int, default=10, help='Number of runs with different random splits.')
-    args = parser.parse_args()
-    comment, num_runs = args.comment, args.runs
-
-    # File to save the results
-    results_file = 'bagged_trees_comparison.csv'
-
-    # Initialize CSV file with headers if not already done
-    with open(results_file, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        if file.tell() == 0:
-            writer.writerow(['Model', 'Best Parameters', 'Average CV Score', 'Run', 'Comment'])
-
-    # Train and evaluate models with hyperparameter tuning for different configurations
-    for run in range(num_runs):
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=run)
-
-        for name, model in models.items():
-            print(f"Hyperparameter tuning for {name}, Run {run + 1}")
-            
-            # Perform Grid Search
-            grid_search = GridSearchCV(model, param_grids[name], cv=5, scoring='accuracy')
-            grid_search.fit(X_train, y_train)
-            best_model = grid_search.best_estimator_
-            print(f"Best parameters for {name}: {grid_search.best_params_}")
-            
-            # Evaluate the best model
-            y_pred = best_model.predict(X_test)
-            print(f"Best {name} Classification Report:")
-            print(classification_report(y_test, y_pred))
-            
-            # Cross-validation scores
-            scores = cross_val_score(best_model, X, y, cv=5)
-            average_cv_score = scores.mean()
-            print(f"Cross-validation scores for best {name}: {scores}")
-            print(f"Average cross-validation score for best {name}: {average_cv_score}\n")
-            
-            # Save the results to the file
-            with open(results_file, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([name, grid_search.best_params_, average_cv_score, run + 1, comment])
-
-            # Plot feature importances for tree-based models
-            # plot_feature_importance(best_model, X.columns, name)
-
-def find_best_model(df):
-    # df = df.drop(columns=["burnedPoints"]) # Remove solution
-    X = df.drop(columns=['class'])
+    cache_dir = FOLD_CACHE_DIR if use_fold_cache else None
+
+    # Dump the feature matrix once, workers open it with mmap_mode='r' instead of receiving a pickled copy
+    X_values, y_values = X.to_numpy(), y.to_numpy()
+    fingerprint = dataset_fingerprint(X_values, y_values)
+
+    # Checkpoint of the finished cells, the results go to the results store once all of them are done
+    checkpoint_file = checkpoint_path(comment, fingerprint)
+    completed = load_checkpoint(checkpoint_file, comment, fingerprint)
+    fold_cache = FoldCache(fingerprint, cache_dir)
+
+    cells = [(name, run) for run in range(num_runs) for name in models]
+    pending = [cell for cell in cells if cell not in completed]
+    if completed:
+        print(f"Resuming comparison, {len(cells) - len(pending)} of {len(cells)} runs already finished")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_path = os.path.join(temp_dir, 'features.joblib')
+        joblib.dump((X_values, y_values), data_path)
+
+        results = Parallel(n_jobs=n_jobs, return_as='generator_unordered')(
+            delayed(evaluate_model_run)(name, models[name], param_grids[name], run, data_path, fingerprint, cache_dir)
+            for name, run in pending
+        )
+
+        # Checkpoint every cell as soon as it finishes
+        with open(checkpoint_file, mode='a') as file:
+            for result in results:
+                fold_cache.save(result.pop('fold_cache'))
+                result.update({'comment': comment, 'fingerprint': fingerprint})
+                completed[(result['model'], result['run'])] = result
+                file.write(json.dumps(result) + '\n')
+                file.flush()
+                print(f"Finished {result['model']}, Run {result['run'] + 1} ({len(completed)}/{len(cells)})")
+
+    print(f"Fold cache: {fold_cache.stats()['cells']} cells for this dataset")
+
+    # Report and save the results in a fixed (run, model) order, no matter the order the workers finished
+    rows = []
+    for name, run in cells:
+        result = completed[(name, run)]
+        print(f"Best parameters for {name}, Run {run + 1}: {result['best_params']}")
+        print(f"Best {name} Classification Report:")
+        print(result['report'])
+        print(f"Cross-validation scores for best {name}: {result['scores']}")
+        print(f"Average cross-validation score for best {name}: {result['average_cv_score']}\n")
+        rows.append({**result, 'run': run + 1})
+
+        # Plot feature importances for tree-based models
+        # plot_feature_importance(best_model, X.columns, name)
+
+    save_results(rows)
+    os.remove(checkpoint_file)
+
+# comment is saved with the results of every run, with use_fold_cache=False every fold is fitted again
+@stage()
+def find_best_model(df, comment='', num_runs=1, use_fold_cache=True):
+    X = feature_matrix(df)
     y = df['class']
 
     # Define hyperparameter grid for Bagged Trees
@@ -99,21 +170,10 @@ def find_best_model(df):
     # Bagged Trees Model
     model = BaggingClassifier(estimator=base_tree)
     
-    # Parse command-line arguments
-    parser = argparse.ArgumentParser(description='Model evaluation with optional comments.')
-    parser.add_argument('--comment', type=str, default='', help='A comment about the changes made.')
-    parser.add_argument('--runs', type=int, default=1, help='Number of runs with different random splits.')
-    args = parser.parse_args()
-    comment, num_runs = args.comment, args.runs
-
-    # File to save the results
-    results_file = 'bagged_trees_comparison.csv'
-
-    # Initialize CSV file with headers if not already done
-    with open(results_file, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        if file.tell() == 0:
-            writer.writerow(['Model', 'Best Parameters', 'Average CV Score', 'Run', 'Comment'])
+    # The results of every run are saved to the results store with the fingerprint of the data, which also selects the
+    # fold cache, so a rerun on the same features only fits the folds it has not seen and the refit of the best parameters
+    fingerprint = dataset_fingerprint(X.to_numpy(), y.to_numpy())
+    fold_cache = FoldCache(fingerprint, FOLD_CACHE_DIR if use_fold_cache else None)
 
     # Train and evaluate models with hyperparameter tuning for different configurations
     best_model = None
@@ -124,39 +184,43 @@ def find_best_model(df):
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=run)
 
         print(f"Hyperparameter tuning for Bagged Trees, Run {run + 1}")
+        start = time.perf_counter()
         
         # Perform Grid Search
-        grid_search = GridSearchCV(model, param_grid, cv=5, scoring='accuracy')
-        grid_search.fit(X_train, y_train)
-        print(f"Best parameters for Bagged Trees: {grid_search.best_params_}")
+        run_model, run_params = cached_grid_search(model, param_grid, X_train, y_train, f'run{run}', fold_cache)
+        print(f"Best parameters for Bagged Trees: {run_params}")
         
         # Evaluate the best model
-        y_pred = grid_search.best_estimator_.predict(X_test)
+        y_pred = run_model.predict(X_test)
         print(f"Best Bagged Trees Classification Report:")
         print(classification_report(y_test, y_pred))
         
-        # Display Confusion Matrix
+        # Display Confusion Matrix, the time waiting on the window is not counted
+        seconds = time.perf_counter() - start
         cm = confusion_matrix(y_test, y_pred)
-        disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=grid_search.best_estimator_.classes_)
+        disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=run_model.classes_)
         disp.plot()
-        plt.show()
+        show(block=True)
 
         # Cross-validation scores
-        scores = cross_val_score(grid_search.best_estimator_, X, y, cv=5)
+        start = time.perf_counter()
+        scores = cached_cv_scores(model, run_params, X, y, 'full', fold_cache)
+        fold_cache.save()
         average_cv_score = scores.mean()
         print(f"Cross-validation scores for best Bagged Trees: {scores}")
         print(f"Average cross-validation score for best Bagged Trees: {average_cv_score}\n")
         
         # Save the best model if it has the highest average CV score
         if average_cv_score > best_score:
-            best_model = grid_search.best_estimator_
-            best_params = grid_search.best_params_
+            best_model = run_model
+            best_params = run_params
             best_score = average_cv_score
         
-        # Save the results to the file
-        with open(results_file, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Bagged Trees', grid_search.best_params_, average_cv_score, run + 1, comment])
+        # Save the results to the store
+        save_result(model='Bagged Trees', run=run + 1, best_params=run_params, average_cv_score=float(average_cv_score),
+                    comment=comment, fingerprint=fingerprint, scores=scores.tolist(), seconds=seconds + time.perf_counter() - start)
+
+    print(f"Fold cache: {fold_cache.stats()}")
 
     # Save the best model and feature names to disk
     joblib.dump((best_model, X.columns.tolist()), 'best_bagged_trees_model.pkl')
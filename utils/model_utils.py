@@ -1,31 +1,81 @@
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler, MultiLabelBinarizer
-from sklearn.feature_selection import VarianceThreshold
+from sklearn.preprocessing import MinMaxScaler
+from .profiling import stage
+
+# Multi-hot encode a column of lists into a uint8 frame, one column per value. Lists are exploded and coded in one go instead of per row
+# The frame is dense uint8 because pandas sparse columns are upcast to int64 on every row selection
+# With categories given (fit=False) the stored values are reused and unknown values are ignored
+def multi_hot(values, categories=None, prefix=None):
+    exploded = values.reset_index(drop=True).explode()
+    if categories is None:
+        categories = sorted(exploded.dropna().unique())
+
+    codes = pd.Categorical(exploded, categories=categories).codes
+    known = codes >= 0
+    matrix = np.zeros((len(values), len(categories)), dtype=np.uint8)
+    matrix[exploded.index.to_numpy()[known], codes[known]] = 1 # A value repeated in the same list is still 1
+
+    columns = [f'{prefix}_{category}' for category in categories] if prefix else list(categories)
+    return pd.DataFrame(matrix, columns=columns, copy=False), categories
+
+# Multi-hot encode categories, focus_areas and labels, with fit=False the categories stored in the pipeline are reused
+def encode_task_categories(df, pipeline=None, fit=True):
+    encoded = []
+    for col in ['categories', 'focus_areas', 'labels']:
+        categories = None if fit else pipeline['categories'][col]
+        encoded_df, categories = multi_hot(df[col], categories, prefix=col)
+        encoded.append(encoded_df)
+        if fit and pipeline is not None:
+            pipeline.setdefault('categories', {})[col] = categories
+
+    # Combine original dataframe with encoded data and drop the original columns
+    return pd.concat([df.reset_index(drop=True), *encoded], axis=1).drop(columns=['categories', 'focus_areas', 'labels'])
+
+# With fit=False the assignees are encoded with the ones stored in the pipeline, unknown assignees are ignored
+def process_assignees(df, pipeline=None, fit=True):
+    assignees_df, assignees = multi_hot(df['assignees'], None if fit else pipeline['assignees'])
+    if fit and pipeline is not None:
+        pipeline['assignees'] = assignees
 
-def process_assignees(df):
-    mlb = MultiLabelBinarizer()
-    assignees_encoded = mlb.fit_transform(df['assignees'])
-    assignees_df = pd.DataFrame(assignees_encoded, columns=mlb.classes_).reset_index(drop=True)
     df = df.drop('assignees', axis=1).reset_index(drop=True)
     assert len(df) == len(assignees_df), "Length of DataFrame and assignees_df do not match!"
     df = pd.concat([df, assignees_df], axis=1).dropna(axis=1, how='all')
-    df = df.loc[:, (df != 0).any(axis=0)]
+
+    # Empty columns are only dropped while fitting, new rows are aligned to the model features later
+    if fit:
+        df = df.loc[:, (df != 0).any(axis=0)]
     
     return df
 
+# The label and the column it is made of, they stay in the frame but are never scaled or used as features
+LABEL_COLUMNS = ('class', 'burnedPoints')
+
+# Dense float32 features for the estimators, the trees convert to float32 anyway so float64 would only double the memory
+def feature_matrix(df):
+    X = df.drop(columns=[col for col in LABEL_COLUMNS if col in df.columns])
+    return pd.DataFrame(X.to_numpy(dtype=np.float32), columns=X.columns, index=X.index)
+
 # NOTE: I can add random selection
 def balance_dataset(df, random_state=None):
     min_count = df['class'].value_counts().min()
     df_balanced = df.groupby('class').sample(n=min_count, random_state=random_state)
     return df_balanced
 
-# Normlize all float64 and int64 values besides class
-def normalize_data(df):
-    minmax_scaler = MinMaxScaler()
-    numeric_features = df.select_dtypes(include=['float64', 'int64']).columns.difference(['class'])
-    normalized_data = minmax_scaler.fit_transform(df[numeric_features])
-    normalized_df = pd.DataFrame(normalized_data, columns=numeric_features)
-    normalized_df['class'] = df['class'].values 
+# Normlize all float64 and int64 values besides the label columns and store them as float32, the uint8 multi-hot columns are left as they are. With fit=False the stored scaler is reused and missing columns count as 0
+def normalize_data(df, pipeline=None, fit=True):
+    if fit:
+        numeric_features = df.select_dtypes(include=['float64', 'int64']).columns.difference(LABEL_COLUMNS)
+        minmax_scaler = MinMaxScaler().fit(df[numeric_features])
+        if pipeline is not None:
+            pipeline['scaler'] = minmax_scaler
+    else:
+        minmax_scaler = pipeline['scaler']
+        numeric_features = list(minmax_scaler.feature_names_in_)
+        df = df.assign(**{col: 0 for col in numeric_features if col not in df.columns})
+
+    df = df.copy()
+    df[numeric_features] = minmax_scaler.transform(df[numeric_features]).astype(np.float32)
     return df
 
 # Remove outlier tasks, drop columns and keep only comments.body 
@@ -35,25 +85,50 @@ def filter_data(df):
     # df = df[df['burnedPoints'] != 0]
     # df = df[df['expectedPoints'] != 1]
     
+    return extract_comment_bodies(df)
+
+# Drop the id columns and keep only comments.body
+def extract_comment_bodies(df):
     df = df.drop(columns=[col for col in ["_id", "createdAt"] if col in df.columns])
     df['comments'] = df['comments'].apply(lambda comments: [comment['body'] for comment in comments] if comments else [])
     return df
 
-# Remove features with low variance and features that are similar 
-def remove_redundant_features(df):
-    # Identify highly correlated features
-    correlation_matrix = df.corr()
-    correlated_features = {
-        correlation_matrix.columns[i]
-        for i in range(len(correlation_matrix.columns))
-        for j in range(i)
-        if abs(correlation_matrix.iloc[i, j]) > 0.8 # Threshold
-    }
+# Remove features with low variance and features that are similar. The variance filter runs first, then the upper triangle of the
+# correlation matrix is computed block by block on float32 standardized data, so memory stays bounded for thousands of columns.
+# A column is dropped if it is correlated with any column before it. The kept columns are stored in the pipeline, with fit=False they are reused
+@stage()
+def remove_redundant_features(df, pipeline=None, fit=True, threshold=0.8, variance_threshold=0.01, block_size=512, protected=LABEL_COLUMNS):
+    if not fit:
+        features = set(pipeline['features'])
+        return df[[col for col in df.columns if col in features or col in protected]]
+
+    columns = [col for col in df.columns if col not in protected]
+    X = df[columns].to_numpy(dtype=np.float32)
 
     # Identify low variance features (not that important)
-    selector = VarianceThreshold(threshold=0.01)
-    selector.fit(df)
-    low_variance_features = set(df.columns[~selector.get_support()])
+    keep = X.var(axis=0) > variance_threshold
+    columns = [col for col, kept in zip(columns, keep) if kept]
+    X = X[:, keep]
 
-    df.drop(columns=correlated_features | low_variance_features, inplace=True)
-    return df
+    # Standardize so X.T @ X / n is the correlation matrix
+    X -= X.mean(axis=0)
+    X /= X.std(axis=0)
+    n_samples, n_columns = X.shape
+
+    # Identify highly correlated features
+    correlated = np.zeros(n_columns, dtype=bool)
+    for start in range(0, n_columns, block_size):
+        end = min(start + block_size, n_columns)
+        for other_start in range(0, end, block_size):
+            other_end = min(other_start + block_size, end)
+            block = np.abs(X[:, start:end].T @ X[:, other_start:other_end]) > threshold * n_samples
+            if other_start == start:
+                block = np.tril(block, k=-1) # Only pairs (i, j) with j < i
+            correlated[start:end] |= block.any(axis=1)
+
+    features = [col for col, is_correlated in zip(columns, correlated) if not is_correlated]
+    if pipeline is not None:
+        pipeline['features'] = features
+
+    features = set(features)
+    return df[[col for col in df.columns if col in features or col in protected]]
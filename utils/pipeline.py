@@ -0,0 +1,73 @@
+import joblib
+import numpy as np
+import pandas as pd
+from .bert import get_bert_embeddings
+from .model_utils import LABEL_COLUMNS, encode_task_categories, extract_comment_bodies, feature_matrix, normalize_data, process_assignees, remove_redundant_features
+from .distrubute_tasks import load_model, predict_proba
+
+PIPELINE_FILE = 'preprocessing_pipeline.pkl'
+
+# Save the fitted transforms next to the model, with a sample of the training features to check new data against
+def save_pipeline(pipeline, df, reference_size=2000):
+    X = feature_matrix(df)
+    pipeline['reference'] = X.sample(n=min(reference_size, len(X)), random_state=0)
+    joblib.dump(pipeline, PIPELINE_FILE)
+
+def load_pipeline():
+    return joblib.load(PIPELINE_FILE)
+
+# Load the model, its feature names and the pipeline once, keep them around when scoring many tasks
+def load_estimator():
+    model, feature_names = load_model()
+    return model, feature_names, load_pipeline()
+
+# Turn raw tasks from script1's output into feature rows with the fitted transforms, nothing is refitted
+# Missing fields count as empty, the same way predict_execution_time fills missing features with 0. Models that were trained
+# with burnedPoints as a feature are refused, a new task has no burnedPoints and 0 would pull every estimate to the fastest class
+def transform_tasks(tasks, pipeline, feature_names):
+    label_features = [col for col in LABEL_COLUMNS if col in feature_names]
+    if label_features:
+        raise ValueError(f"The saved model uses {label_features} as features, train it again with script2.py train")
+    defaults = {'categories': [], 'focus_areas': [], 'labels': [], 'assignees': [], 'comments': [], 'title': '', 'body': '', 'commitMessages': ''}
+    df = pd.DataFrame([{**defaults, **task} for task in tasks])
+
+    df = encode_task_categories(df, pipeline, fit=False)
+    df = extract_comment_bodies(df)
+    df = normalize_data(df, pipeline, fit=False)
+    df = process_assignees(df, pipeline, fit=False)
+    df = get_bert_embeddings(df, pipeline=pipeline, fit=False, **pipeline['bert'])
+    df = remove_redundant_features(df, pipeline, fit=False)
+
+    X = df.reindex(columns=feature_names, fill_value=0)
+    return pd.DataFrame(X.to_numpy(dtype=np.float32), columns=feature_names)
+
+# Estimate the class of raw tasks, each one for its own list of assignees. Every task is embedded once, then its row is repeated
+# with only the candidate assignee column set and all rows are scored with one predict_proba
+def estimate_tasks(tasks, assignees, model, feature_names, pipeline):
+    X = transform_tasks([{**task, 'assignees': []} for task in tasks], pipeline, feature_names).to_numpy()
+    counts = [len(task_assignees) for task_assignees in assignees]
+    X = np.repeat(X, counts, axis=0)
+
+    column_index = {name: i for i, name in enumerate(feature_names)}
+    flat_assignees = [assignee for task_assignees in assignees for assignee in task_assignees]
+    for row, assignee in enumerate(flat_assignees):
+        if assignee in column_index:
+            X[row, column_index[assignee]] = 1
+
+    probabilities = predict_proba(model, X)
+    classes = model.classes_.tolist()
+    estimates = [
+        {'class': classes[np.argmax(probability)], 'probabilities': dict(zip(classes, probability.tolist()))}
+        for probability in probabilities
+    ]
+
+    # Split the flat rows back per task
+    results, start = [], 0
+    for task_assignees in assignees:
+        results.append(dict(zip(task_assignees, estimates[start:start + len(task_assignees)])))
+        start += len(task_assignees)
+    return results
+
+# Estimate the class of a raw task for each assignee
+def estimate_task(task, assignees, model, feature_names, pipeline):
+    return estimate_tasks([task], [assignees], model, feature_names, pipeline)[0]
@@ -1,8 +1,18 @@
 import matplotlib.pyplot as plt
-import networkx as nx
+import numpy as np
 from collections import Counter
+from .report import show
 
-def plot_commit_task_network(data):
+# Tasks on the top row and commits on the bottom one, both in insertion order so the commits of a task sit under it
+# (networkx bipartite_layout orders the nodes of each side as a set, which crosses every edge)
+def layered_layout(task_nodes, commit_nodes):
+    pos = {node: (x, 1.0) for node, x in zip(task_nodes, np.linspace(0, 1, len(task_nodes)))}
+    pos.update({node: (x, 0.0) for node, x in zip(commit_nodes, np.linspace(0, 1, len(commit_nodes)))})
+    return pos
+
+# spring_layout is O(n^2) per iteration, above spring_nodes the tasks and commits are placed in two layers instead and
+# above max_nodes a random sample of the tasks is drawn. Labels are only drawn while they are readable
+def plot_commit_task_network(data, max_nodes=2000, spring_nodes=300, seed=0):
     """
     Plot a bar chart of commit frequencies.
     
@@ -19,6 +29,16 @@ def plot_commit_task_network(data):
                     "commitId": "commitId1",
                 }
     """
+    import networkx as nx
+    n_nodes = len(data) + sum(len(task['commits']) for task in data)
+    title = 'Task-Commit Bipartite Graph'
+    if n_nodes > max_nodes:
+        rng = np.random.default_rng(seed)
+        keep = np.sort(rng.permutation(len(data))[:max(1, int(len(data) * max_nodes / n_nodes))])
+        title += f' ({len(keep)} of {len(data)} tasks sampled)'
+    else:
+        keep = range(len(data))
+
     G = nx.Graph()
 
     # for task in data:
@@ -30,7 +50,9 @@ def plot_commit_task_network(data):
     #         G.add_edge(task_node, commit_node)
 
     # Anonymed data
-    for task_index, task in enumerate(data, start=1):
+    for task_index in keep:
+        task = data[task_index]
+        task_index += 1
         task_node = f"Task{task_index}"
         G.add_node(task_node, bipartite=0)
         for commit_index, commit in enumerate(task['commits'], start=1):
@@ -38,18 +60,21 @@ def plot_commit_task_network(data):
             G.add_node(commit_node, bipartite=1)
             G.add_edge(task_node, commit_node)
 
-    pos = nx.spring_layout(G)
     task_nodes = [n for n, d in G.nodes(data=True) if d['bipartite'] == 0]
-    commit_nodes = [n for n in G if n not in task_nodes]
+    commit_nodes = [n for n, d in G.nodes(data=True) if d['bipartite'] == 1]
+    small = len(G) <= spring_nodes
+    pos = nx.spring_layout(G, seed=seed) if small else layered_layout(task_nodes, commit_nodes)
+    node_size = 700 if small else max(5, 20000 // len(G))
 
     plt.figure(figsize=(12, 8))
-    nx.draw_networkx_nodes(G, pos, nodelist=task_nodes, node_color='skyblue', node_size=700, label='Tasks')
-    nx.draw_networkx_nodes(G, pos, nodelist=commit_nodes, node_color='lightgreen', node_size=700, label='Commits')
-    nx.draw_networkx_edges(G, pos)
-    nx.draw_networkx_labels(G, pos, font_size=7, font_color='black', font_weight='bold')
-    plt.title('Task-Commit Bipartite Graph')
+    nx.draw_networkx_nodes(G, pos, nodelist=task_nodes, node_color='skyblue', node_size=node_size, label='Tasks')
+    nx.draw_networkx_nodes(G, pos, nodelist=commit_nodes, node_color='lightgreen', node_size=node_size, label='Commits')
+    nx.draw_networkx_edges(G, pos, width=1.0 if small else 0.2)
+    if small:
+        nx.draw_networkx_labels(G, pos, font_size=7, font_color='black', font_weight='bold')
+    plt.title(title)
     plt.legend()
-    plt.show(block=False)
+    show()
 
 def plot_commit_frequencies(data):
     """
@@ -87,7 +112,7 @@ def plot_commit_frequencies(data):
     plt.title('Occurrences of Commit IDs')
     plt.xticks(rotation=90)
     plt.tight_layout()
-    plt.show(block=False)
+    show()
 
 def plot_commits(data):
     plot_commit_frequencies(data)
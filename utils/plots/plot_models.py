@@ -1,10 +1,9 @@
 import matplotlib.pyplot as plt
 import ast
-import plotly.express as px
-import seaborn as sns
-from scipy.stats import mode
 import numpy as np
 import pandas as pd
+from .report import show
+from ..results_store import load_results
 
 # Plot different models cv accuracies and their best average parameters
 def plot_best_model(data):
@@ -14,8 +13,9 @@ def plot_best_model(data):
             Medium Tree,"{'max_depth': 7, 'min_samples_leaf': 1, 'min_samples_split': 10}",0.7093078381795195,1,Running multiple configurations without dropped lines
             Boosted Trees,"{'learning_rate': 0.01, 'n_estimators': 200}",0.6737357774968393,1,Running multiple configurations without dropped lines
     """
+    # Rows from load_results already hold dicts, only an old csv needs parsing
     def parse_best_parameters(param_str):
-        return ast.literal_eval(param_str)
+        return ast.literal_eval(param_str) if isinstance(param_str, str) else param_str
 
     def calculate_average_best_parameters(data):
         best_params = data['Best Parameters'].apply(parse_best_parameters)
@@ -57,10 +57,12 @@ def plot_best_model(data):
     plt.legend()
     plt.grid(True)
     plt.savefig('model_comparison.png')
-    plt.show(block=False)
+    show()
 
 # Combined heatmap plotting
 def plot_heatmap_categories(df):
+    import seaborn as sns
+    from scipy.stats import mode
     most_frequent = lambda x: mode(x)[0]
     df_exploded = df.explode('categories').explode('focus_areas')
     agg_funcs = {'mean': 'Heatmap of Categories and Focus Areas with Class Averages', 
@@ -73,14 +75,15 @@ def plot_heatmap_categories(df):
         plt.title(title)
         plt.ylabel("Categories")
         plt.xlabel("Focus Areas")
-        plt.show(block=False)
+        show()
 
 # Plotting the histogram for burnedPoints
 def plot_for_key(df, key):
+    import plotly.express as px
     fig = px.histogram(df, x=key, nbins=100, title=f"Distribution of {key} Points")
     fig.update_traces(marker_line_width=1.5, marker_line_color="black")
     fig.update_layout(xaxis_title='Expected Points', yaxis_title='Number of Tasks')
-    fig.show()
+    show(fig)
 
 def plot_feature_importance(model, feature_names, model_name):
     if hasattr(model, 'feature_importances_'):
@@ -92,17 +95,21 @@ def plot_feature_importance(model, feature_names, model_name):
         plt.bar(range(len(importances)), importances[indices], align="center")
         plt.xticks(range(len(importances)), [feature_names[i] for i in indices], rotation=90)
         plt.tight_layout()
-        plt.show(block=False)
+        show()
 
+# file_path is the results store (.db) or an old csv, with the store the comment is filtered in sql
 def plot_csv_models(file_path, filter_phrase):
-    # Read the CSV data from the file
-    df = pd.read_csv(file_path)
+    if file_path.endswith('.db'):
+        filtered_df = load_results(file_path, comment=filter_phrase)
+    else:
+        # Read the CSV data from the file
+        df = pd.read_csv(file_path)
 
-    # Extract the parameters from the 'Best Parameters' column
-    df['Best Parameters'] = df['Best Parameters'].apply(ast.literal_eval)
+        # Extract the parameters from the 'Best Parameters' column
+        df['Best Parameters'] = df['Best Parameters'].apply(ast.literal_eval)
 
-    # Filter the data based on the filter_phrase in the 'Comment' column
-    filtered_df = df[df['Comment'].str.contains(filter_phrase, case=False)]
+        # Filter the data based on the filter_phrase in the 'Comment' column
+        filtered_df = df[df['Comment'].str.contains(filter_phrase, case=False)]
 
     # Get unique comments from the filtered data
     unique_comments = filtered_df['Comment'].unique()
@@ -124,7 +131,7 @@ def plot_csv_models(file_path, filter_phrase):
     plt.ylabel('Average CV Score')
     plt.legend()
     plt.grid(True)
-    plt.show(block=False)
+    show()
 
 def plot_task_assignment(task_assignment, assignee_names, categorize_burned_points):
     def prepare_data(task_assignment):
@@ -142,7 +149,7 @@ def plot_task_assignment(task_assignment, assignee_names, categorize_burned_poin
         plt.ylabel('Number of Tasks')
         plt.title('Number of Tasks per Assignee')
         plt.xticks(rotation=45)
-        plt.show(block=False)
+        show()
 
     def plot_time_summary(df):
         classes_sum = df.groupby('assigned_to').agg({
@@ -156,7 +163,7 @@ def plot_task_assignment(task_assignment, assignee_names, categorize_burned_poin
         plt.title('Estimated Time, Actual Time, and Expected Time per Assignee')
         plt.xticks(rotation=45)
         plt.legend(['Estimated Time', 'Actual Time', 'Expected Time'])
-        plt.show(block=False)
+        show()
 
     df = prepare_data(task_assignment)
     plot_task_count(df)
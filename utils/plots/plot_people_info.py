@@ -1,20 +1,28 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import defaultdict
-from datetime import datetime
-from scipy.stats import linregress
+import pandas as pd
+from .report import show
+
+# One row per task with the dates parsed once, the plots below aggregate this with groupby instead of python loops
+def people_frame(data):
+    df = pd.DataFrame({
+        'title': [item['title'] for item in data],
+        'categories': [item['categories'] for item in data],
+        'focus_areas': [item['focus_areas'] for item in data],
+        'done': [item['points']['done'] for item in data],
+        'total': [item['points']['total'] for item in data]
+    })
+    if data and 'createdAt' in data[0]:
+        df['createdAt'] = pd.to_datetime(pd.Series([item['createdAt'] for item in data]).str.replace('Z', '', regex=False), format='ISO8601')
+    return df
 
 def plot_progress(data, subplots_per_figure=2):
-    grouped_data = defaultdict(list)
-    for item in data:
-        for category in item['categories']:
-            for focus_area in item['focus_areas']:
-                grouped_data[(category, focus_area)].append(item)
-    
-    plot_data = sorted(
-        {key: items for key, items in grouped_data.items() if len(items) > 2}.items(),
-        key=lambda x: (x[0][0], x[0][1])
-    )
+    from scipy.stats import linregress
+    df = people_frame(data).explode('categories').explode('focus_areas').dropna(subset=['categories', 'focus_areas'])
+    df = df.sort_values('createdAt', kind='stable')
+
+    # Only (category, focus area) pairs with more than 2 tasks, sorted by the pair
+    plot_data = [(key, items) for key, items in df.groupby(['categories', 'focus_areas'], sort=True) if len(items) > 2]
     
     num_plots = len(plot_data)
     num_figures = (num_plots + subplots_per_figure - 1) // subplots_per_figure
@@ -29,16 +37,15 @@ def plot_progress(data, subplots_per_figure=2):
             axes = [axes]
         
         for ax, ((category, focus_area), items) in zip(axes, plot_data[fig_index * subplots_per_figure:(fig_index + 1) * subplots_per_figure]):
-            items.sort(key=lambda x: datetime.fromisoformat(x['createdAt'].replace('Z', '')))
-            dates = [datetime.fromisoformat(item['createdAt'].replace('Z', '')) for item in items]
-            progress = [item['points']['done'] for item in items]
-            expected_points = [item['points']['total'] for item in items]
+            dates = items['createdAt'].to_numpy()
+            progress = items['done'].to_numpy()
+            expected_points = items['total'].to_numpy()
             
             ax.plot(dates, progress, marker='o', label='Points Done')
             ax.plot(dates, expected_points, marker='x', linestyle='--', label='Expected Points')
 
-            avg_prog = np.mean(progress)
-            std_prog = np.std(progress)
+            avg_prog = progress.mean()
+            std_prog = progress.std()
             
             ax.axhline(avg_prog, color='r', linestyle='--', label=f'Average ({avg_prog:.2f})')
             ax.fill_between(dates, avg_prog - std_prog, avg_prog + std_prog, color='r', alpha=0.2, label=f'Std Dev ({std_prog:.2f})')
@@ -47,8 +54,9 @@ def plot_progress(data, subplots_per_figure=2):
             ax.annotate(f'Max: {progress[max_idx]}', xy=(dates[max_idx], progress[max_idx]), xytext=(10, 10), textcoords='offset points', arrowprops=dict(arrowstyle='->', lw=1))
             ax.annotate(f'Min: {progress[min_idx]}', xy=(dates[min_idx], progress[min_idx]), xytext=(10, -10), textcoords='offset points', arrowprops=dict(arrowstyle='->', lw=1))
             
-            slope, intercept, r_value, _, _ = linregress([date.timestamp() for date in dates], progress)
-            ax.plot(dates, [slope * date.timestamp() + intercept for date in dates], color='g', linestyle='-', label=f'Trendline (R²={r_value**2:.2f})')
+            timestamps = (items['createdAt'] - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+            slope, intercept, r_value, _, _ = linregress(timestamps, progress)
+            ax.plot(dates, slope * timestamps + intercept, color='g', linestyle='-', label=f'Trendline (R²={r_value**2:.2f})')
             
             ax.set_title(f"({category},{focus_area})")
             ax.set_xlabel("Date")
@@ -57,51 +65,45 @@ def plot_progress(data, subplots_per_figure=2):
             ax.legend()
         
         plt.tight_layout()
-        plt.show(block=False)
+        show()
 
-def plot_average_points_per_task(data):
-    titles = [item['title'] for item in data]
-    total_points = [item['points']['total'] for item in data]
-    done_points = [item['points']['done'] for item in data]
+# Above max_labels tasks the bars become filled steps without titles, thousands of patches and rotated labels take minutes to draw
+def plot_average_points_per_task(data, max_labels=100):
+    df = people_frame(data)
+    total_points = df['total'].to_numpy()
+    done_points = df['done'].to_numpy()
 
-    x = range(len(data))
+    x = np.arange(len(df))
 
     fig, ax = plt.subplots(figsize=(10, 6))
-    bar_width = 0.35
-    ax.bar(x, total_points, width=bar_width, label='Expected Points', align='center', color='skyblue', edgecolor='black')
-    ax.bar(x, done_points, width=bar_width, label='Burned Points', align='edge', color='lightgreen', edgecolor='black')
+    if len(df) <= max_labels:
+        bar_width = 0.35
+        ax.bar(x, total_points, width=bar_width, label='Expected Points', align='center', color='skyblue', edgecolor='black')
+        ax.bar(x, done_points, width=bar_width, label='Burned Points', align='edge', color='lightgreen', edgecolor='black')
+        ax.set_xticks(x)
+        ax.set_xticklabels(df['title'], rotation=45, ha='right')
+    else:
+        # One step artist per series instead of a patch per bar
+        edges = np.arange(len(df) + 1) - 0.5
+        ax.stairs(total_points, edges, fill=True, label='Expected Points', color='skyblue')
+        ax.stairs(done_points, edges, fill=True, label='Burned Points', color='lightgreen', alpha=0.8)
 
     ax.set_xlabel('Tasks')
     ax.set_ylabel('Points')
     ax.set_title('Points Distribution per Task')
-    ax.set_xticks(x)
-    ax.set_xticklabels(titles, rotation=45, ha='right')
-    ax.legend()
+    ax.legend(loc='upper right')
 
     plt.tight_layout()
-    plt.show(block=False)
+    show()
 
 def plot_average_points_per_category(data):
-    def aggregate_data(data):
-        aggregated_data = defaultdict(lambda: {'total_sum': 0, 'done_sum': 0, 'count': 0})
-        
-        for item in data:
-            key = (tuple(item['categories']), tuple(item['focus_areas']))
-            aggregated_data[key]['total_sum'] += item['points']['total']
-            aggregated_data[key]['done_sum'] += item['points']['done']
-            aggregated_data[key]['count'] += 1
-        
-        for key in aggregated_data:
-            aggregated_data[key]['total_avg'] = aggregated_data[key]['total_sum'] / aggregated_data[key]['count']
-            aggregated_data[key]['done_avg'] = aggregated_data[key]['done_sum'] / aggregated_data[key]['count']
-        
-        return aggregated_data
+    df = people_frame(data)
+    df['key'] = [(tuple(categories), tuple(focus_areas)) for categories, focus_areas in zip(df['categories'], df['focus_areas'])]
+    aggregated_data = df.groupby('key', sort=False)[['total', 'done']].mean()
 
-    aggregated_data = aggregate_data(data)
-    
-    categories_areas = [' / '.join(cat + foc) for cat, foc in aggregated_data.keys()]
-    total_points_avg = [value['total_avg'] for value in aggregated_data.values()]
-    done_points_avg = [value['done_avg'] for value in aggregated_data.values()]
+    categories_areas = [' / '.join(cat + foc) for cat, foc in aggregated_data.index]
+    total_points_avg = aggregated_data['total'].to_numpy()
+    done_points_avg = aggregated_data['done'].to_numpy()
 
     x = range(len(aggregated_data))
 
@@ -118,7 +120,7 @@ def plot_average_points_per_category(data):
     ax.legend()
 
     plt.tight_layout()
-    plt.show(block=False)
+    show()
 
 def plot_people_results(data):
     plot_progress(data)
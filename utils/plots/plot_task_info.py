@@ -1,30 +1,14 @@
 import matplotlib.pyplot as plt
 import pandas as pd
-import networkx as nx
+from .report import show
 
 # Plot my tasks from detailed_task_type
 def plot_task_distribution(data):
-    titles = []
-    categories = []
-    focus_areas = []
-
-    for item in data:
-        for title, details in item.items():
-            if details["Categories"] and details["FocusArea"]:
-                for category in details["Categories"]:
-                    for focus_area in details["FocusArea"]:
-                        titles.append(str(title))
-                        categories.append(str(category))
-                        focus_areas.append(str(focus_area))
-            else:
-                continue
-
-    # Create a DataFrame
-    df = pd.DataFrame({
-        "Title": titles,
-        "Categories": categories,
-        "FocusArea": focus_areas
-    })
+    # One row per (title, category, focus area), only tasks that have both
+    df = pd.DataFrame(
+        [(title, details["Categories"], details["FocusArea"]) for item in data for title, details in item.items() if details["Categories"] and details["FocusArea"]],
+        columns=["Title", "Categories", "FocusArea"]
+    ).explode("Categories").explode("FocusArea").astype(str)
 
     # Count the occurrences of each category and focus area
     category_counts = df["Categories"].value_counts()
@@ -48,9 +32,10 @@ def plot_task_distribution(data):
     axes[1].tick_params(axis='x', rotation=45)  # Rotate x-axis labels
 
     plt.tight_layout()
-    plt.show(block=False)
+    show()
 
 def plot_statusEdits(statusEdits, idx):
+    import networkx as nx
     G = nx.DiGraph()
 
     # Add edges to the graph
@@ -67,7 +52,7 @@ def plot_statusEdits(statusEdits, idx):
     nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='red', font_size=8)
 
     plt.title(f'Status Edits Flow Diagram {idx + 1}')
-    plt.show()
+    show(block=True)
 
 def plot_status_edits(status_edits, idx):
     """
@@ -80,6 +65,7 @@ def plot_status_edits(status_edits, idx):
         {'from': 'Review', 'to': 'Closed', 'createdAt': '2023-05-03'}
     ]
     """
+    import networkx as nx
     G = nx.DiGraph()
 
     for edit in status_edits:
@@ -93,4 +79,4 @@ def plot_status_edits(status_edits, idx):
     nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_color='red', font_size=8)
 
     plt.title(f'Status Edits Flow Diagram {idx + 1}')
-    plt.show()
\ No newline at end of file
+    show(block=True)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import html
+import os
+import sys
+import time
+import traceback
+import matplotlib
+from joblib import Parallel, delayed
+
+# Headless mode, figures are written to files instead of opening windows. It is on when TASK_REPORT_DIR is set or
+# inside render_report, e.g. TASK_REPORT_DIR=reports python script2.py
+report_dir = os.environ.get('TASK_REPORT_DIR')
+prefix, counter = 'figure', 0
+written = []
+
+def headless():
+    return report_dir is not None
+
+def set_headless(directory, name='figure'):
+    global report_dir, prefix, counter
+    report_dir, prefix, counter = directory, name, 0
+    os.makedirs(directory, exist_ok=True)
+    matplotlib.use('Agg') # Switches pyplot too if it is already imported, otherwise pyplot starts with Agg
+
+if report_dir is not None:
+    set_headless(report_dir)
+
+def next_path(extension):
+    global counter
+    counter += 1
+    path = os.path.join(report_dir, f"{prefix}_{counter:02d}.{extension}")
+    written.append(path)
+    return path
+
+# Used by the plots instead of plt.show / fig.show. Plotly figures are saved as html, every open matplotlib figure as png
+def show(fig=None, block=False):
+    import matplotlib.pyplot as plt # Already imported by the plot that called show, not on import of the scripts
+    if not headless():
+        if fig is not None:
+            fig.show()
+        else:
+            plt.show(block=block)
+        return
+
+    if fig is not None:
+        fig.write_html(next_path('html'), include_plotlyjs='directory')
+        return
+
+    for number in plt.get_fignums():
+        plt.figure(number).savefig(next_path('png'), dpi=100, bbox_inches='tight')
+    plt.close('all')
+
+# Replaces the input() at the end of the scripts, there are no windows to wait for in headless mode
+def wait_for_close():
+    if not headless():
+        input("\nPress Enter to close the graphs...")
+
+# Runs in a worker process, errors are kept for the index page so one broken plot doesn't stop the rest
+def render_job(directory, name, func, args, kwargs):
+    set_headless(directory, name)
+    del written[:]
+    start = time.perf_counter()
+    try:
+        func(*args, **kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+        import matplotlib.pyplot as plt
+        plt.close('all')
+    return {'name': name, 'files': [os.path.basename(path) for path in written], 'seconds': time.perf_counter() - start, 'error': error}
+
+# Render independent plots in parallel worker processes and write an index.html that links all of them
+# jobs: list of (func, args) or (func, args, kwargs), e.g. [(plot_progress, (tasks,)), (plot_best_model, (results,))]
+# The figures show() already saved in this process (e.g. the confusion matrix of find_best_model) are listed first
+def render_report(jobs, directory=None, n_jobs=-1, title='Report'):
+    global report_dir, prefix, counter
+    directory = directory or report_dir or 'reports'
+    os.makedirs(directory, exist_ok=True)
+    main_files, state = list(written), (report_dir, prefix, counter)
+
+    names, tasks = [], []
+    for job in jobs:
+        func, args, kwargs = (*job, {}) if len(job) == 2 else job
+        name = func.__name__
+        if name in names: # Same plot with different data
+            name = f"{name}_{names.count(name) + 1}"
+        names.append(func.__name__)
+        tasks.append(delayed(render_job)(directory, name, func, args, kwargs))
+
+    results = Parallel(n_jobs=n_jobs)(tasks)
+    # With n_jobs=1 the jobs run in this process and change its headless state, it is put back for later show() calls
+    written[:] = main_files
+    report_dir, prefix, counter = state
+
+    if main_files:
+        files = [os.path.relpath(path, directory).replace(os.sep, '/') for path in main_files]
+        script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'main'
+        results.insert(0, {'name': script, 'files': files, 'seconds': None, 'error': None})
+    index = write_index(results, directory, title)
+
+    for result in results:
+        if result['error']:
+            print(f"Plot {result['name']} failed:\n{result['error']}")
+    print(f"Report with {sum(len(result['files']) for result in results)} figures written to {index}")
+    return index
+
+def write_index(results, directory, title):
+    sections = []
+    for result in results:
+        body = []
+        for file in result['files']:
+            if file.endswith('.png'):
+                body.append(f'<a href="{file}"><img src="{file}" loading="lazy"></a>')
+            else:
+                body.append(f'<iframe src="{file}" loading="lazy"></iframe>')
+        if result['error']:
+            body.append(f'<pre class="error">{html.escape(result["error"])}</pre>')
+        seconds = f' <small>({result["seconds"]:.1f}s)</small>' if result['seconds'] is not None else ''
+        sections.append(f'<h2 id="{result["name"]}">{result["name"]}{seconds}</h2>\n' + '\n'.join(body))
+
+    links = ' | '.join(f'<a href="#{result["name"]}">{result["name"]}</a>' for result in results)
+    page = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+img {{ max-width: 100%; border: 1px solid #ddd; margin: 0.5em 0; }}
+iframe {{ width: 100%; height: 550px; border: 1px solid #ddd; }}
+.error {{ color: #b00; background: #fee; padding: 1em; }}
+</style>
+</head>
+<body>
+<h1>{html.escape(title)}</h1>
+<p>Generated {time.strftime('%Y-%m-%d %H:%M:%S')} | {links}</p>
+{chr(10).join(sections)}
+</body>
+</html>
+"""
+    path = os.path.join(directory, 'index.html')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(page)
+    return path
@@ -0,0 +1,55 @@
+import hashlib
+import pickle
+import sys
+from collections import OrderedDict
+import numpy as np
+
+# Hash of the fitted model and its feature names, a refitted or grown model gets a new hash so old predictions are never reused
+def model_fingerprint(model, feature_names):
+    return hashlib.blake2b(pickle.dumps((model, list(feature_names))), digest_size=16).hexdigest()
+
+# Hash of every task's feature row (without the candidate assignee), equal tasks share their predictions
+def task_fingerprints(X):
+    X = np.ascontiguousarray(X)
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in X]
+
+# Bounded LRU cache of predicted classes keyed by (model hash, task fingerprint, assignee). Keep one instance around while
+# trying what-if scenarios, so adding an assignee only costs one prediction per task
+class PredictionCache:
+    def __init__(self, max_entries=1000000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.memory = 0
+
+    @staticmethod
+    def entry_size(key, value):
+        return sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(value)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return
+        self.entries[key] = value
+        self.memory += self.entry_size(key, value)
+        while len(self.entries) > self.max_entries:
+            old_key, old_value = self.entries.popitem(last=False)
+            self.memory -= self.entry_size(old_key, old_value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_bytes': self.memory
+        }
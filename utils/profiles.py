@@ -0,0 +1,126 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import joblib
+
+# Performance profile of every assignee per (category, focus area) built from script1's output. A cell keeps the number of
+# tasks, the sum of their burnedPoints, a histogram of them on half points (values above 10 count in the last bin) and the
+# number of tasks of every class, so profiles of new tasks are merged by adding and the mean, quantiles and class
+# frequencies are derived from the counts. The classes come from the raw burnedPoints, not the rounded histogram, so they
+# are the labels the model is trained on
+PROFILES_FILE = 'assignee_profiles.pkl'
+POINT_BINS = np.arange(0, 10.5, 0.5)
+CLASSES = [1, 2, 3]
+CLASS_COLUMNS = [f'class_{c}' for c in CLASSES]
+CLASS_THRESHOLDS = [0.5, 2] # Same thresholds as categorize_burned_points in script2
+
+def burned_points_class(points):
+    return np.digitize(points, CLASS_THRESHOLDS, right=True)
+
+class AssigneeProfiles:
+    def __init__(self):
+        index = pd.MultiIndex.from_arrays([[], [], []], names=['assignee', 'category', 'focus_area'])
+        self.table = pd.DataFrame(columns=['count', 'sum', *range(len(POINT_BINS)), *CLASS_COLUMNS], index=index, dtype=float)
+        self.version = 0
+        self.dense = None
+
+    # Add tasks with assignees, categories, focus_areas and burnedPoints, a task counts in every (assignee, category, focus area) it has
+    def update(self, tasks):
+        df = pd.DataFrame(tasks, columns=['assignees', 'categories', 'focus_areas', 'burnedPoints'])
+        df = df.explode('assignees').explode('categories').explode('focus_areas').dropna().reset_index(drop=True)
+        if df.empty:
+            return self
+
+        points = df['burnedPoints'].to_numpy(dtype=float)
+        bins = np.clip(np.searchsorted(POINT_BINS, points - 0.25), 0, len(POINT_BINS) - 1)
+        histogram = pd.DataFrame(np.eye(len(POINT_BINS))[bins], index=df.index)
+        classes = pd.DataFrame(np.eye(len(CLASSES))[burned_points_class(points)], index=df.index, columns=CLASS_COLUMNS)
+        cells = pd.concat([df[['assignees', 'categories', 'focus_areas']], df['burnedPoints'].astype(float).rename('sum'), histogram, classes], axis=1)
+        delta = cells.groupby(['assignees', 'categories', 'focus_areas']).sum()
+        delta.index.names = self.table.index.names
+        delta.insert(0, 'count', delta[list(range(len(POINT_BINS)))].sum(axis=1))
+
+        self.table = delta if self.table.empty else self.table.add(delta, fill_value=0)
+        self.version += 1
+        self.dense = None
+        return self
+
+    def fingerprint(self):
+        return hashlib.blake2b(pd.util.hash_pandas_object(self.table).to_numpy().tobytes(), digest_size=8).hexdigest()
+
+    # count, mean, quartiles of burnedPoints and class frequencies of every cell
+    def summary(self):
+        histogram = self.table[list(range(len(POINT_BINS)))].to_numpy()
+        cumulative = histogram.cumsum(axis=1) / self.table[['count']].to_numpy()
+        quantiles = {f'q{int(q * 100)}': POINT_BINS[np.argmax(cumulative >= q, axis=1)] for q in [0.25, 0.5, 0.75]}
+        class_counts = self.table[CLASS_COLUMNS].to_numpy()
+        return pd.DataFrame({
+            'count': self.table['count'].astype(int),
+            'mean': self.table['sum'] / self.table['count'],
+            **quantiles,
+            **{f'class_{c}': class_counts[:, i] / self.table['count'] for i, c in enumerate(CLASSES)}
+        }, index=self.table.index)
+
+    # Class counts as a dense assignee x category x focus area x class array, built once per version
+    def class_array(self):
+        if self.dense is None:
+            assignees, categories, focus_areas = (level.tolist() for level in self.table.index.remove_unused_levels().levels)
+            class_counts = self.table[CLASS_COLUMNS].to_numpy()
+            counts = np.zeros((len(assignees), len(categories), len(focus_areas), len(CLASSES)))
+            codes = [self.table.index.get_level_values(i).map({name: j for j, name in enumerate(names)}).to_numpy()
+                     for i, names in enumerate([assignees, categories, focus_areas])]
+            for i in range(len(CLASSES)):
+                counts[codes[0], codes[1], codes[2], i] = class_counts[:, i]
+            self.dense = (counts, assignees, categories, focus_areas)
+        return self.dense
+
+    # Class counts of every (task, assignee) pair as a T x A x class array, summed over the categories and focus areas of the
+    # task. tasks are processed rows (categories_<name> and focus_areas_<name> columns) or raw tasks with the lists
+    def pair_counts(self, tasks, assignees):
+        counts, known_assignees, categories, focus_areas = self.class_array()
+        df = pd.DataFrame(tasks)
+        if 'categories' in df.columns and 'focus_areas' in df.columns:
+            in_list = lambda column, names: np.array([[name in (values or []) for name in names] for values in df[column]], dtype=float).reshape(len(df), len(names))
+            task_categories, task_focus_areas = in_list('categories', categories), in_list('focus_areas', focus_areas)
+        else:
+            task_categories = df.reindex(columns=[f'categories_{name}' for name in categories], fill_value=0).to_numpy(dtype=float)
+            task_focus_areas = df.reindex(columns=[f'focus_areas_{name}' for name in focus_areas], fill_value=0).to_numpy(dtype=float)
+
+        assignee_index = {name: i for i, name in enumerate(known_assignees)}
+        selected = np.zeros((len(assignees),) + counts.shape[1:])
+        known = [(a, assignee_index[assignee]) for a, assignee in enumerate(assignees) if assignee in assignee_index]
+        if known:
+            selected[[a for a, _ in known]] = counts[[i for _, i in known]]
+        return np.einsum('tc,tf,acfk->tak', task_categories, task_focus_areas, selected)
+
+    # Class distribution of every (task, assignee) pair, smoothed with the overall distribution of the assignee (or of everyone
+    # for unknown assignees) so pairs without history still get a distribution
+    def pair_distribution(self, tasks, assignees, smoothing=1.0):
+        pair_counts = self.pair_counts(tasks, assignees)
+        counts, known_assignees, _, _ = self.class_array()
+        overall = counts.sum(axis=(0, 1, 2)) + 1
+        assignee_index = {name: i for i, name in enumerate(known_assignees)}
+        assignee_overall = np.array([counts[assignee_index[a]].sum(axis=(0, 1)) + 1 if a in assignee_index else overall for a in assignees])
+        assignee_overall = assignee_overall / assignee_overall.sum(axis=1, keepdims=True)
+
+        distribution = pair_counts + smoothing * assignee_overall[np.newaxis]
+        return distribution / distribution.sum(axis=2, keepdims=True), pair_counts.sum(axis=2)
+
+    # Constant time estimate for one assignee: class frequencies, mean and number of past tasks in the given categories and focus areas
+    def estimate(self, assignee, categories, focus_areas):
+        cells = [(assignee, category, focus_area) for category in categories for focus_area in focus_areas]
+        rows = self.table.reindex(cells).dropna()
+        if rows.empty:
+            return None
+        class_counts = rows[CLASS_COLUMNS].to_numpy().sum(axis=0)
+        return {
+            'count': int(class_counts.sum()),
+            'mean': float(rows['sum'].sum() / class_counts.sum()),
+            'classes': {c: float(class_counts[i] / class_counts.sum()) for i, c in enumerate(CLASSES)}
+        }
+
+def load_profiles(path=PROFILES_FILE):
+    return joblib.load(path)
+
+def save_profiles(profiles, path=PROFILES_FILE):
+    joblib.dump(profiles, path)
@@ -0,0 +1,201 @@
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# Stage instrumentation for both pipelines, off unless the TASK_PROFILE environment variable is set, e.g.
+#   TASK_PROFILE=1                 stage timers, rows in/out and RSS
+#   TASK_PROFILE=memory,sample     also tracemalloc peaks per stage and a sampling profiler of the main thread
+# The report is written to TASK_PROFILE_DIR (default profile_reports) as json with a summary printed when the run ends
+OPTIONS = {option.strip() for option in os.environ.get('TASK_PROFILE', '').lower().split(',') if option.strip() and option.strip() != '0'}
+ENABLED = bool(OPTIONS)
+
+stages = []
+stack = []
+sampler = None
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError): # No /proc or os.sysconf, e.g. macOS or Windows
+        return None
+
+# resource is Unix only, elsewhere (Windows) the peak of the python allocations traced by tracemalloc is used when it runs
+def max_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return tracemalloc.get_traced_memory()[1] / 2**20 if tracemalloc.is_tracing() else rss_mb()
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+def count_rows(value):
+    if isinstance(value, tuple): # e.g. find_best_model returns (model, params, score)
+        return None
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+# Samples the stack of the main thread every interval seconds and counts the functions on it
+class StackSampler(threading.Thread):
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.thread_id = threading.main_thread().ident
+        self.own_time, self.total_time = Counter(), Counter()
+        self.samples = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples += 1
+                self.own_time[self.describe(frame)] += 1
+                seen = set()
+                while frame is not None:
+                    name = self.describe(frame)
+                    if name not in seen:
+                        self.total_time[name] += 1
+                        seen.add(name)
+                    frame = frame.f_back
+            time.sleep(self.interval)
+
+    @staticmethod
+    def describe(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.relpath(code.co_filename)}:{code.co_firstlineno})"
+
+    def report(self, top=25):
+        share = lambda count: round(count / self.samples, 4) if self.samples else 0
+        return {
+            'samples': self.samples,
+            'interval': self.interval,
+            'own': [{'function': name, 'share': share(count)} for name, count in self.own_time.most_common(top)],
+            'total': [{'function': name, 'share': share(count)} for name, count in self.total_time.most_common(top)]
+        }
+
+# Decorator for a pipeline stage, when profiling is off it only costs one check of ENABLED per call
+def stage(name=None):
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+
+            record = {'stage': stage_name, 'depth': len(stack), 'rows_in': count_rows(args[0]) if args else None}
+            if 'memory' in OPTIONS:
+                record['tracemalloc_peak_mb'] = 0.0
+                if stack:
+                    stack[-1]['tracemalloc_peak_mb'] = max(stack[-1]['tracemalloc_peak_mb'], tracemalloc.get_traced_memory()[1] / 2**20)
+                tracemalloc.reset_peak()
+            stack.append(record)
+
+            start = time.perf_counter()
+            record['started'] = start - START
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                record['seconds'] = time.perf_counter() - start
+                stack.pop()
+                if 'memory' in OPTIONS:
+                    record['tracemalloc_peak_mb'] = max(record['tracemalloc_peak_mb'], tracemalloc.get_traced_memory()[1] / 2**20)
+                    if stack:
+                        stack[-1]['tracemalloc_peak_mb'] = max(stack[-1]['tracemalloc_peak_mb'], record['tracemalloc_peak_mb'])
+                record['rss_mb'] = rss_mb()
+                record['max_rss_mb'] = max_rss_mb()
+                stages.append(record)
+
+            record['rows_out'] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def summary(report):
+    max_rss = '-' if report['max_rss_mb'] is None else f"{report['max_rss_mb']:.0f}"
+    lines = [f"\nProfile of {report['script']} ({report['seconds']:.2f}s, max RSS {max_rss} MiB)"]
+    lines.append(f"{'stage':<40}{'seconds':>10}{'rows in':>10}{'rows out':>10}{'RSS MiB':>10}{'peak MiB':>10}")
+    for record in report['stages']:
+        cells = [record.get(key) for key in ['rows_in', 'rows_out', 'rss_mb', 'tracemalloc_peak_mb']]
+        cells = ['-' if value is None else f"{value:.0f}" for value in cells]
+        lines.append(f"{'  ' * record['depth'] + record['stage']:<40}{record['seconds']:>10.3f}" + ''.join(f"{cell:>10}" for cell in cells))
+    if 'sampler' in report:
+        lines.append("\nMost sampled functions (own time):")
+        lines.extend(f"  {entry['share']:>6.1%}  {entry['function']}" for entry in report['sampler']['own'][:10])
+    return '\n'.join(lines)
+
+def write_report():
+    if sampler is not None:
+        sampler.running = False
+
+    report = {
+        'script': os.path.basename(sys.argv[0]),
+        'argv': sys.argv[1:],
+        'started_at': STARTED_AT.isoformat(),
+        'seconds': time.perf_counter() - START,
+        'max_rss_mb': max_rss_mb(),
+        'options': sorted(OPTIONS),
+        'stages': sorted(stages, key=lambda record: record['started'])
+    }
+    if sampler is not None:
+        report['sampler'] = sampler.report()
+
+    directory = os.environ.get('TASK_PROFILE_DIR', 'profile_reports')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.path.splitext(report['script'])[0]}_{STARTED_AT.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json")
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    print(summary(report))
+    print(f"Profile report written to {path}")
+
+# The worker processes (joblib/loky pools) inherit TASK_PROFILE, only the main process traces, samples and writes a report
+if ENABLED:
+    START, STARTED_AT = time.perf_counter(), datetime.now()
+    if multiprocessing.parent_process() is None:
+        if 'memory' in OPTIONS:
+            tracemalloc.start()
+        if 'sample' in OPTIONS:
+            sampler = StackSampler()
+            sampler.start()
+        atexit.register(write_report)
+
+# Import time of a command per top level package, e.g. python -m utils.profiling imports script2.py distribute --assignees a b
+# The command runs again under python -X importtime and the own time of every module is summed under its package
+def import_report(command, top=15):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', *command], capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+
+    packages, modules = Counter(), Counter()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(own) / 1e6
+        modules[name.strip()] += int(cumulative) / 1e6
+
+    print(f"{' '.join(command)}: {seconds:.2f}s, {sum(packages.values()):.2f}s importing {len(modules)} modules")
+    if result.returncode:
+        print(f"The command failed with exit code {result.returncode}, only the imports until the error are counted")
+    print(f"{'package':<30}{'seconds':>10}")
+    for package, package_seconds in packages.most_common(top):
+        print(f"{package:<30}{package_seconds:>10.3f}")
+    return {'seconds': seconds, 'packages': dict(packages), 'modules': dict(modules)}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != 'imports':
+        print("Usage: python -m utils.profiling imports script.py [arguments]")
+    else:
+        import_report(sys.argv[2:])
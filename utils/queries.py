@@ -132,46 +132,47 @@ def categorize_commits_query(tasks):
         }
     ]
 
+# Pack the items into as few queries as fit in max_tokens each
+def pack_queries(items, query_function, max_tokens):
+    all_queries = []
+    current_items = []
+
+    def format_files_for_categorize(commits):
+        for commit in commits:
+            commit["files"] = [
+                f"+{file['additions']} -{file['deletions']} {file['filename']}" 
+                for file in commit["files"]
+            ]
+        return commits
+
+    for item in items:
+        temp_items = current_items + [item]
+        temp_query = query_function(temp_items)
+        temp_token_count = sum(count_tokens(query_item['content']) for query_item in temp_query)
+
+        if temp_token_count > max_tokens:
+            if current_items:
+                all_queries.append(query_function(current_items))
+            current_items = [item]
+
+            # Apply format if tokens exceeded and make commits be (+ additions - deletions filename)
+            if query_function == categorize_commits_query:
+                item_copy = copy.deepcopy(item)
+                item_copy['commits'] = format_files_for_categorize(item_copy['commits'])
+                current_items = [item_copy]
+        else:
+            current_items.append(item)
+
+    if current_items:
+        all_queries.append(query_function(current_items))
+
+    return all_queries
+
 # Break queries if they exceed a token count, if nothing can be done return empty
 def process_queries(items, query_function, path, should_write_file=False, max_tokens=8192):
-    def process_with_max_tokens(max_tokens):
-        all_queries = []
-        current_items = []
-
-        def format_files_for_categorize(commits):
-            for commit in commits:
-                commit["files"] = [
-                    f"+{file['additions']} -{file['deletions']} {file['filename']}" 
-                    for file in commit["files"]
-                ]
-            return commits
-
-        for item in items:
-            temp_items = current_items + [item]
-            temp_query = query_function(temp_items)
-            temp_token_count = sum(count_tokens(query_item['content']) for query_item in temp_query)
-
-            if temp_token_count > max_tokens:
-                if current_items:
-                    all_queries.append(query_function(current_items))
-                current_items = [item]
-
-                # Apply format if tokens exceeded and make commits be (+ additions - deletions filename)
-                if query_function == categorize_commits_query:
-                    item_copy = copy.deepcopy(item)
-                    item_copy['commits'] = format_files_for_categorize(item_copy['commits'])
-                    current_items = [item_copy]
-            else:
-                current_items.append(item)
-
-        if current_items:
-            all_queries.append(query_function(current_items))
-
-        return all_queries
-
     def retry_with_different_tokens(initial_tokens):
         for tokens in initial_tokens:
-            all_queries = process_with_max_tokens(tokens)
+            all_queries = pack_queries(items, query_function, tokens)
             if all_queries and not all(len(query) == 0 for query in all_queries):
                 return all_queries
             
@@ -0,0 +1,132 @@
+import ast
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+
+# Results of find_best_model and different_models_comparison, one row per (model, run) with the best parameters exploded
+# into typed param_<name> columns, so plots and comparisons filter in SQL instead of parsing a csv
+RESULTS_DB = 'experiment_results.db'
+
+COLUMNS = {
+    'Model': 'model',
+    'Best Parameters': 'best_params',
+    'Average CV Score': 'average_cv_score',
+    'Run': 'run',
+    'Comment': 'comment',
+    'Fingerprint': 'fingerprint',
+    'Scores': 'scores',
+    'Seconds': 'seconds',
+    'Created At': 'created_at'
+}
+
+def connect(db=RESULTS_DB):
+    conn = sqlite3.connect(db)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model TEXT NOT NULL,
+            run INTEGER NOT NULL,
+            comment TEXT NOT NULL DEFAULT '',
+            average_cv_score REAL,
+            scores TEXT,
+            best_params TEXT,
+            fingerprint TEXT,
+            seconds REAL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    for column in ['model', 'comment', 'created_at']:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS results_{column} ON results ({column})")
+    return conn
+
+def param_column(name):
+    return 'param_' + ''.join(c if c.isalnum() else '_' for c in name)
+
+def sql_type(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return 'INTEGER'
+    if isinstance(value, float):
+        return 'REAL'
+    return 'TEXT'
+
+# Parameters that are not numbers (e.g. an estimator) are stored as their repr
+def param_value(value):
+    return value if isinstance(value, (int, float, str)) or value is None else repr(value)
+
+# rows: dicts with model, run, best_params, average_cv_score and optionally comment, fingerprint, scores, seconds, created_at
+def save_results(rows, db=RESULTS_DB):
+    rows = list(rows)
+    with closing(connect(db)) as conn, conn:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+        for row in rows:
+            for name, value in row['best_params'].items():
+                column = param_column(name)
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE results ADD COLUMN "{column}" {sql_type(value)}')
+                    existing.add(column)
+
+        created_at = datetime.now().isoformat(timespec='seconds')
+        for row in rows:
+            values = {
+                'model': row['model'],
+                'run': row['run'],
+                'comment': row.get('comment', ''),
+                'average_cv_score': row['average_cv_score'],
+                'scores': json.dumps(row['scores']) if row.get('scores') is not None else None,
+                'best_params': json.dumps({name: param_value(value) for name, value in row['best_params'].items()}),
+                'fingerprint': row.get('fingerprint'),
+                'seconds': row.get('seconds'),
+                'created_at': row.get('created_at', created_at)
+            }
+            values.update({param_column(name): param_value(value) for name, value in row['best_params'].items()})
+            columns = ', '.join(f'"{column}"' for column in values)
+            conn.execute(f"INSERT INTO results ({columns}) VALUES ({', '.join('?' * len(values))})", list(values.values()))
+
+def save_result(db=RESULTS_DB, **row):
+    save_results([row], db)
+
+# Filtered read, comment is matched as a case insensitive substring like plot_csv_models did and since/until compare the
+# ISO timestamps. The columns keep the names of the old csv, Best Parameters is already a dict
+def load_results(db=RESULTS_DB, model=None, comment=None, fingerprint=None, since=None, until=None):
+    conditions, values = [], []
+    if model is not None:
+        models = [model] if isinstance(model, str) else list(model)
+        conditions.append(f"model IN ({', '.join('?' * len(models))})")
+        values.extend(models)
+    if comment is not None:
+        conditions.append("comment LIKE ?")
+        values.append(f'%{comment}%')
+    if fingerprint is not None:
+        conditions.append("fingerprint = ?")
+        values.append(fingerprint)
+    if since is not None:
+        conditions.append("created_at >= ?")
+        values.append(str(since))
+    if until is not None:
+        conditions.append("created_at < ?")
+        values.append(str(until))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    with closing(connect(db)) as conn:
+        df = pd.read_sql_query(f"SELECT * FROM results {where} ORDER BY id", conn, params=values)
+
+    df['best_params'] = df['best_params'].map(json.loads)
+    df['scores'] = df['scores'].map(lambda scores: json.loads(scores) if isinstance(scores, str) else None)
+    df = df.drop(columns='id').rename(columns={column: name for name, column in COLUMNS.items()})
+    # Parameters no selected row has are left out
+    empty = [column for column in df.columns if column.startswith('param_') and df[column].isna().all()]
+    return df.drop(columns=empty)
+
+# Move the rows of the old bagged_trees_comparison.csv into the store, parsing the parameters once
+def import_csv(csv_path, db=RESULTS_DB):
+    df = pd.read_csv(csv_path)
+    save_results(({
+        'model': row['Model'],
+        'run': int(row['Run']),
+        'comment': '' if pd.isna(row['Comment']) else row['Comment'],
+        'average_cv_score': float(row['Average CV Score']),
+        'best_params': ast.literal_eval(row['Best Parameters'])
+    } for _, row in df.iterrows()), db)
+    print(f"Imported {len(df)} results from {csv_path} into {db}")
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from .pipeline import load_estimator, estimate_tasks
+
+# Long running estimator that keeps the model and the pipeline warm. Concurrent requests are put on a queue and a single worker
+# thread coalesces everything that arrives within window seconds (up to max_batch tasks) into one estimate_tasks call
+class EstimateBatcher:
+    def __init__(self, window=0.005, max_batch=256, latency_samples=10000):
+        self.model, self.feature_names, self.pipeline = load_estimator()
+        self.window, self.max_batch = window, max_batch
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=latency_samples)
+        self.batch_sizes = deque(maxlen=latency_samples)
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    # Blocks until the batch holding these tasks is scored, assignees is one list per task
+    def estimate(self, tasks, assignees):
+        start = time.perf_counter()
+        future = Future()
+        self.requests.put((tasks, assignees, future))
+        result = future.result()
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.window
+            while size < self.max_batch:
+                try:
+                    batch.append(self.requests.get(timeout=max(0, deadline - time.perf_counter())))
+                    size += len(batch[-1][0])
+                except queue.Empty:
+                    break
+            self.score(batch)
+
+    # A request that fails the batch (e.g. a malformed task) would fail all the others, then every request is scored on
+    # its own so only the bad one gets the error
+    def score(self, batch):
+        tasks = [task for request_tasks, _, _ in batch for task in request_tasks]
+        assignees = [task_assignees for _, request_assignees, _ in batch for task_assignees in request_assignees]
+        try:
+            estimates = estimate_tasks(tasks, assignees, self.model, self.feature_names, self.pipeline)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+            else:
+                for request in batch:
+                    self.score([request])
+            return
+
+        self.batch_sizes.append(len(tasks))
+        start = 0
+        for request_tasks, _, future in batch:
+            future.set_result(estimates[start:start + len(request_tasks)])
+            start += len(request_tasks)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 90, 99]).tolist() if len(latencies) else [None] * 3
+        return {
+            'queue_depth': self.requests.qsize(),
+            'requests': len(latencies),
+            'latency_ms': dict(zip(['p50', 'p90', 'p99'], percentiles)),
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else None
+        }
+
+# POST /estimate with {"task": {...}, "assignees": [...]} or {"tasks": [...], "assignees": [...]}, GET /stats
+# In a bulk request assignees is either one list for all the tasks or one list per task
+class EstimateHandler(BaseHTTPRequestHandler):
+    batcher = None
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.send_json(200, self.batcher.stats())
+        else:
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/estimate':
+            return self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            single = 'task' in body
+            tasks = [body['task']] if single else body['tasks']
+            assignees = body['assignees']
+            if not assignees or isinstance(assignees[0], str):
+                assignees = [assignees] * len(tasks)
+            if len(assignees) != len(tasks):
+                raise ValueError("assignees must be one list or one list per task")
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(400, {'error': str(e)})
+
+        try:
+            estimates = self.batcher.estimate(tasks, assignees)
+        except Exception as e:
+            return self.send_json(500, {'error': str(e)})
+        self.send_json(200, {'estimates': estimates[0] if single else estimates})
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    # BaseHTTPRequestHandler expects a (host, port) client address
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+def serve(host='127.0.0.1', port=8765, socket_path=None, window=0.005, max_batch=256):
+    EstimateHandler.batcher = EstimateBatcher(window, max_batch)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, EstimateHandler)
+        print(f"Serving estimates on {socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), EstimateHandler)
+        print(f"Serving estimates on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local prediction service for task estimates.')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', type=str, default=None, help='Serve on a Unix socket instead of TCP.')
+    parser.add_argument('--window', type=float, default=0.005, help='Seconds to wait for more requests before scoring a batch.')
+    parser.add_argument('--max-batch', type=int, default=256, help='Maximum number of tasks scored together.')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.socket, args.window, args.max_batch)
@@ -0,0 +1,119 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+# Incremental ingestion of the Cyclopt exports. Instead of a full export every time, delta exports (the records that changed
+# since the last pull, script1.js already sorts by updatedAt) are dropped as json files in DROP_DIR, e.g. exports/tasks_2024-06-01.json,
+# and merged by _id into the local dataset in DATA_DIR. A drop file is either a list of records, where a record with
+# "deleted": true is a deletion, or {"records": [...], "deleted": [ids]}. Processed files are moved to DROP_DIR/processed
+DROP_DIR = 'exports'
+DATA_DIR = 'data'
+COLLECTIONS = {'tasks': '_id', 'commits': '_id'}
+
+def parse_date(date_str):
+    return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+
+def read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf8') as file:
+        return json.load(file)
+
+# Write to a temporary file first so an interrupted sync never leaves a half written dataset
+def write_json(path, data):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False, encoding='utf8') as file:
+        json.dump(data, file, indent=2)
+    os.replace(file.name, path)
+
+def read_drop_file(path):
+    data = read_json(path, [])
+    if isinstance(data, dict):
+        return data.get('records', []), data.get('deleted', [])
+    records = [record for record in data if not record.get('deleted')]
+    deleted = [record for record in data if record.get('deleted')]
+    return records, deleted
+
+# Merge the drop files of one collection. Records older than the high-water mark of the last sync are skipped (the mark
+# only moves after every file is merged, the exports are newest first), a record only counts as changed if it differs from
+# the local copy. The changed and deleted ids stay pending in the sync state until mark_processed, so a failed run gets
+# them again on the next sync. Returns the pending changed and deleted ids
+def sync_collection(name, drop_dir=DROP_DIR, data_dir=DATA_DIR, key=None):
+    key = key or COLLECTIONS.get(name, '_id')
+    dataset_path = os.path.join(data_dir, f'{name}.json')
+    state_path = os.path.join(data_dir, 'sync_state.json')
+
+    state = read_json(state_path, {})
+    high_water_mark = state.get(name)
+    hwm_date = parse_date(high_water_mark) if high_water_mark else None
+    newest, newest_date = high_water_mark, hwm_date
+    dataset = {record[key]: record for record in read_json(dataset_path, [])}
+
+    pending = state.get('pending', {}).get(name, {})
+    changed, deleted = set(pending.get('changed', [])), set(pending.get('deleted', []))
+    files = sorted(glob.glob(os.path.join(drop_dir, f'{name}*.json')))
+    for path in files:
+        records, deletions = read_drop_file(path)
+
+        for record in records:
+            updated_at = record.get('updatedAt')
+            if updated_at and hwm_date and parse_date(updated_at) < hwm_date:
+                continue
+            # The files are merged in name order, an older version of a record in a later file doesn't replace the newer one
+            stored = dataset.get(record[key])
+            if updated_at and stored and stored.get('updatedAt') and parse_date(updated_at) < parse_date(stored['updatedAt']):
+                continue
+            if stored != record:
+                dataset[record[key]] = record
+                changed.add(record[key])
+                deleted.discard(record[key])
+            if updated_at and (newest_date is None or parse_date(updated_at) > newest_date):
+                newest, newest_date = updated_at, parse_date(updated_at)
+
+        for record in deletions:
+            record_id = record[key] if isinstance(record, dict) else record
+            if dataset.pop(record_id, None) is not None:
+                deleted.add(record_id)
+                changed.discard(record_id)
+
+    if files:
+        write_json(dataset_path, list(dataset.values()))
+        state[name] = newest
+        state.setdefault('pending', {})[name] = {'changed': sorted(changed), 'deleted': sorted(deleted)}
+        write_json(state_path, state)
+
+        processed_dir = os.path.join(drop_dir, 'processed')
+        os.makedirs(processed_dir, exist_ok=True)
+        for path in files:
+            shutil.move(path, os.path.join(processed_dir, os.path.basename(path)))
+
+    print(f"Synced {name}: {len(files)} files, {len(changed)} changed, {len(deleted)} deleted, {len(dataset)} total")
+    return {'changed': sorted(changed), 'deleted': sorted(deleted), 'high_water_mark': newest}
+
+# Clear the ids that were processed (e.g. the tasks script1 loaded) from the pending changed and deleted ids of a
+# collection, the others stay pending for the next run
+def mark_processed(name, ids, data_dir=DATA_DIR):
+    state_path = os.path.join(data_dir, 'sync_state.json')
+    state = read_json(state_path, {})
+    pending = state.get('pending', {}).get(name)
+    if pending is None:
+        return
+    ids = set(ids)
+    pending['changed'] = sorted(set(pending['changed']) - ids)
+    pending['deleted'] = sorted(set(pending['deleted']) - ids)
+    write_json(state_path, state)
+
+# Sync every collection, None if there is no drop folder so the scripts keep working on a full export
+def sync_exports(drop_dir=DROP_DIR, data_dir=DATA_DIR):
+    if not os.path.isdir(drop_dir):
+        return None
+    return {name: sync_collection(name, drop_dir, data_dir, key) for name, key in COLLECTIONS.items()}
+
+# The synced dataset of a collection if there is one, else None
+def synced_file(name, data_dir=DATA_DIR):
+    path = os.path.join(data_dir, f'{name}.json')
+    return path if os.path.exists(path) else None
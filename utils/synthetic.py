@@ -0,0 +1,202 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Seeded synthetic Cyclopt data, so the pipelines can be run and benchmarked without the private exports.
+# generate_tasks/generate_commits give raw records like the database (input of script1), to_script2_records applies the
+# transformations of script1.js and generate_features gives a numeric frame like the one find_best_model gets
+CATEGORIES = ["Bug Fixes", "Testing & Code Review", "Optimization", "Feature", "Code Refactoring", "Dependencies", "Documentation & General"]
+FOCUS_AREAS = ["Frontend", "Backend", "DevOps & Cloud", "Database", "Security", "AI", "Embedded"]
+LABELS = ["bug", "invalid", "enhancement", "feature", "documentation", "testing", "design", "question", "urgent", "chore", "Backlog"]
+PRIORITIES = ["none", "low", "medium", "high"]
+FLOW = ["Backlog", "Sprint Planning", "In Progress", "Delivered", "Accepted"]
+WORDS = ("fix add update remove refactor test api endpoint login user page cache query database index migration deploy docker "
+         "pipeline build error crash bug frontend backend component button form modal table chart report export import auth "
+         "token session config env release version dependency upgrade performance memory slow timeout retry queue worker job "
+         "schedule email notification search filter sort pagination upload file image style layout mobile responsive").split()
+EXTENSIONS = ['js', 'ts', 'jsx', 'py', 'php', 'java', 'css', 'json', 'md', 'yml']
+FOLDERS = ['src', 'api', 'components', 'services', 'models', 'utils', 'tests', 'config', 'analyzer', 'scripts']
+
+def object_id(rng):
+    return ''.join(rng.choice(list('0123456789abcdef'), 24))
+
+def format_date(date):
+    return date.strftime('%Y-%m-%dT%H:%M:%S.') + f'{date.microsecond // 1000:03d}Z'
+
+def pick(rng, values, k):
+    return [str(value) for value in rng.choice(values, k, replace=False)]
+
+def sentence(rng, n_words):
+    return ' '.join(rng.choice(WORDS, n_words))
+
+# Raw tasks with statusEdits along the flow (sometimes going back), points edits, comments and assignees
+def generate_tasks(n_tasks=1000, n_assignees=10, seed=0, start='2023-01-01', days=365):
+    rng = np.random.default_rng(seed)
+    assignees = [object_id(rng) for _ in range(n_assignees)]
+    speed = rng.lognormal(0, 0.4, n_assignees) # Some assignees are faster than others
+    start = datetime.fromisoformat(start)
+
+    tasks = []
+    for i in range(n_tasks):
+        created_at = start + timedelta(seconds=float(rng.uniform(0, days * 86400)))
+        task_assignees = list(rng.choice(n_assignees, rng.choice([1, 1, 1, 2]), replace=False))
+        total = float(rng.choice([0.5, 1, 1, 2, 2, 3, 5, 8]))
+        done = max(0.5, round(total * speed[task_assignees[0]] * rng.lognormal(0, 0.3) * 2) / 2)
+
+        # Status edits from Backlog to Accepted, the time in progress grows with the points done
+        status_edits, date, status = [], created_at, 'Backlog'
+        for next_status in FLOW[1:]:
+            date += timedelta(hours=float(rng.exponential(8 if next_status != 'Delivered' else 12 * done)))
+            status_edits.append({'from': status, 'to': next_status, 'createdAt': format_date(date)})
+            status = next_status
+            if next_status == 'Delivered' and rng.random() < 0.1: # Sent back to progress
+                date += timedelta(hours=float(rng.exponential(6)))
+                status_edits.append({'from': 'Delivered', 'to': 'In Progress', 'createdAt': format_date(date)})
+                date += timedelta(hours=float(rng.exponential(6)))
+                status_edits.append({'from': 'In Progress', 'to': 'Delivered', 'createdAt': format_date(date)})
+        end = date
+
+        span = (end - created_at).total_seconds()
+        between = lambda: format_date(created_at + timedelta(seconds=float(rng.uniform(0, span))))
+        estimated_edits = [{'fromPoints': total, 'toPoints': total + float(rng.choice([-1, 1])), 'createdAt': between()} for _ in range(rng.poisson(0.3))]
+        burned_edits = [{'fromPoints': 0, 'toPoints': done, 'createdAt': between()} for _ in range(rng.poisson(1))]
+
+        tasks.append({
+            '_id': object_id(rng),
+            'title': sentence(rng, rng.integers(3, 8)).capitalize(),
+            'body': sentence(rng, rng.integers(0, 60)),
+            'labels': pick(rng, LABELS, rng.integers(0, 3)),
+            'priority': str(rng.choice(PRIORITIES)),
+            'points': {'total': total, 'done': done},
+            'comments': [{'body': sentence(rng, rng.integers(3, 25)), 'createdAt': between()} for _ in range(rng.poisson(1.5))],
+            'statusEdits': status_edits,
+            'pointsEstimatedEdits': estimated_edits,
+            'pointsBurnedEdits': burned_edits,
+            'dueDate': format_date(end + timedelta(days=3)) if rng.random() < 0.3 else None,
+            'assignees': [assignees[a] for a in task_assignees],
+            'createdAt': format_date(created_at),
+            'updatedAt': format_date(end),
+            'commits': []
+        })
+    return tasks
+
+# Commits by authors with files and messages. Most of them are made while a task is in progress and reuse words of its title
+# so that add_commits_to_tasks and the commit queries find matches, the rest is noise spread over the whole period
+def generate_commits(tasks, n_commits=5000, n_authors=10, seed=0, linked_share=0.8):
+    rng = np.random.default_rng(seed + 1)
+    authors = [f'developer{i}' for i in range(n_authors)]
+    dates = [datetime.strptime(edit['createdAt'], '%Y-%m-%dT%H:%M:%S.%fZ') for task in tasks for edit in task['statusEdits']]
+    first, last = min(dates), max(dates)
+
+    commits = []
+    for _ in range(n_commits):
+        if tasks and rng.random() < linked_share:
+            task = tasks[rng.integers(len(tasks))]
+            start = datetime.strptime(task['statusEdits'][0]['createdAt'], '%Y-%m-%dT%H:%M:%S.%fZ')
+            end = datetime.strptime(task['statusEdits'][-1]['createdAt'], '%Y-%m-%dT%H:%M:%S.%fZ')
+            date = start + (end - start) * float(rng.random())
+            message = ' '.join(rng.choice(task['title'].lower().split(), 2)) + ' ' + sentence(rng, rng.integers(1, 5))
+        else:
+            task = None
+            date = first + (last - first) * float(rng.random())
+            message = sentence(rng, rng.integers(2, 8))
+
+        commit = {
+            '_id': object_id(rng),
+            'author': str(rng.choice(authors)),
+            'createdAt': format_date(date),
+            'message': message,
+            'files': [{
+                '_id': object_id(rng),
+                'filename': f"{'/'.join(rng.choice(FOLDERS, rng.integers(1, 4)))}/{rng.choice(WORDS)}.{rng.choice(EXTENSIONS)}",
+                'additions': int(rng.geometric(0.05)),
+                'deletions': int(rng.geometric(0.1)) - 1
+            } for _ in range(rng.integers(1, 8))]
+        }
+        if task is not None:
+            task['commits'].append(commit)
+        commits.append(commit)
+    return commits
+
+# The fields script1.js computes for every task plus the categories and focus areas script1 adds, the input of script2
+def to_script2_records(tasks, seed=0):
+    rng = np.random.default_rng(seed + 2)
+    label_mappings = {'invalid': 'fix', 'enhancement': 'feature', 'documentation': 'review', 'testing': 'review', 'question': 'communication', 'urgent': 'fix', 'chore': 'todo'}
+    flow = FLOW[1:]
+
+    records = []
+    for task in tasks:
+        deviations, last_flow_index = 0, 0
+        for edit in task['statusEdits']:
+            if edit['from'] != 'Backlog' and edit['to'] != 'Backlog' and edit['to'] != edit['from']:
+                from_index, to_index = flow.index(edit['from']), flow.index(edit['to'])
+                if from_index <= last_flow_index and to_index < from_index:
+                    deviations += 1
+                last_flow_index = max(last_flow_index, to_index)
+
+        estimated_edits = task['pointsEstimatedEdits']
+        files = [file for commit in task['commits'] for file in commit['files']]
+        records.append({
+            'focus_areas': pick(rng, FOCUS_AREAS, rng.integers(1, 3)),
+            'categories': pick(rng, CATEGORIES, rng.integers(1, 3)),
+            'assignees': task['assignees'],
+            '_id': task['_id'],
+            'title': task['title'],
+            'body': task['body'],
+            'labels': list(dict.fromkeys(label_mappings.get(label, label) for label in task['labels'] if label != 'Backlog')),
+            'priority': PRIORITIES.index(task['priority']),
+            'comments': task['comments'],
+            'dueDate': 0 if task['dueDate'] is None else 1,
+            'pointsEstimatedNumberOfEdits': len(estimated_edits),
+            'pointsEstimatedEditsTotalDifference': estimated_edits[-1]['toPoints'] - estimated_edits[0]['fromPoints'] if estimated_edits else 0,
+            'pointsBurnedNumberOfEdits': len(task['pointsBurnedEdits']),
+            'numberOfLabels': len(task['labels']),
+            'expectedPoints': round(task['points']['total'] * 2) / 2,
+            'burnedPoints': round(task['points']['done'] * 2) / 2,
+            'numberOfComments': len(task['comments']),
+            'numberOfCommits': len(task['commits']),
+            'totalAdditions': sum(file['additions'] for file in files),
+            'totalDeletions': sum(file['deletions'] for file in files),
+            'numberOfFilesChanged': len(files),
+            'commitMessages': ' | '.join(commit['message'] for commit in task['commits']),
+            'statusDeviateFromFlow': deviations
+        })
+    return records
+
+# Numeric frame like the input of find_best_model: groups of correlated columns (like the one-hot and pca columns),
+# one-hot assignee columns named by 24 char ids and a class that depends on a few of the columns and the assignee
+def generate_features(n_tasks=1000, n_assignees=10, n_features=100, seed=0, correlated_share=0.3):
+    rng = np.random.default_rng(seed)
+    n_base = max(1, int(n_features * (1 - correlated_share)))
+    X = rng.standard_normal((n_tasks, n_base)).astype(np.float32)
+    copies = X[:, rng.integers(n_base, size=n_features - n_base)] + 0.1 * rng.standard_normal((n_tasks, n_features - n_base)).astype(np.float32)
+    df = pd.DataFrame(np.hstack([X, copies]), columns=[f'feature_{i}' for i in range(n_features)])
+
+    assignees = [object_id(rng) for _ in range(n_assignees)]
+    assigned = rng.integers(n_assignees, size=n_tasks)
+    one_hot = pd.DataFrame(np.eye(n_assignees, dtype=np.uint8)[assigned], columns=assignees)
+
+    score = X[:, :3].sum(axis=1) + rng.normal(0, 1, n_assignees)[assigned] + rng.normal(0, 0.5, n_tasks)
+    df = pd.concat([df, one_hot], axis=1)
+    df['class'] = np.digitize(score, np.quantile(score, [1 / 3, 2 / 3])) + 1
+    df['burnedPoints'] = np.choose(df['class'] - 1, [0.5, 2.0, 3.0])
+    df['expectedPoints'] = df['burnedPoints'] + rng.choice([0, 0.5, 1], n_tasks)
+    return df, assignees
+
+# A tiny randomly initialized BERT with a vocabulary of WORDS saved to directory, use it with BERT_MODEL=directory
+def tiny_bert(directory, seed=0, hidden_size=32, num_hidden_layers=1):
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizer
+
+    os.makedirs(directory, exist_ok=True)
+    vocab_file = os.path.join(directory, 'vocab.txt')
+    with open(vocab_file, 'w') as file:
+        file.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', '.', ',', '!', '?', "'", '-'] + sorted(set(WORDS))) + '\n')
+    BertTokenizer(vocab_file).save_pretrained(directory)
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(open(vocab_file).read().split()), hidden_size=hidden_size, num_hidden_layers=num_hidden_layers,
+                        num_attention_heads=2, intermediate_size=hidden_size * 2, max_position_embeddings=512)
+    BertModel(config).save_pretrained(directory)
+    return directory
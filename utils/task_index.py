@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import joblib
+from .bert import get_bert_embeddings
+from .model_utils import extract_comment_bodies
+
+TASK_INDEX_FILE = 'task_index.pkl'
+METADATA = ['_id', 'title', 'burnedPoints', 'assignees', 'class']
+
+def normalize_rows(vectors):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+# Nearest past tasks by cosine similarity of their embeddings. Up to ivf_threshold tasks a query is an exact scan (one
+# matrix-vector product), above it the index is an IVF: the vectors are clustered with k-means into about sqrt(n) lists and
+# a query only scans the n_probe lists with the closest centroids. New tasks are added to the list of their closest centroid,
+# the lists are clustered again once the index doubled since the last clustering
+class TaskIndex:
+    def __init__(self, ivf_threshold=20000, n_probe=8, seed=0):
+        self.ivf_threshold, self.n_probe, self.seed = ivf_threshold, n_probe, seed
+        self.vectors = None # Grows by doubling, only the first size rows are used
+        self.size = 0
+        self.tasks = []
+        self.rows = {} # _id -> row, tasks that are already indexed are skipped
+        self.centroids, self.lists, self.trained_size = None, None, 0
+
+    def __len__(self):
+        return self.size
+
+    # vectors: one embedding per task, tasks: dicts with at least the METADATA keys that are known
+    def add(self, vectors, tasks):
+        vectors = normalize_rows(vectors)
+        new = [i for i, task in enumerate(tasks) if task.get('_id') is None or task['_id'] not in self.rows]
+        if not new:
+            return 0
+        vectors = vectors[new]
+
+        if self.vectors is None:
+            self.vectors = np.zeros((max(1024, len(new)), vectors.shape[1]), dtype=np.float32)
+        elif self.size + len(new) > len(self.vectors):
+            capacity = max(2 * len(self.vectors), self.size + len(new))
+            self.vectors = np.vstack([self.vectors, np.zeros((capacity - len(self.vectors), self.vectors.shape[1]), dtype=np.float32)])
+
+        start = self.size
+        self.vectors[start:start + len(new)] = vectors
+        self.size += len(new)
+        for row, i in enumerate(new, start):
+            self.tasks.append({key: tasks[i].get(key) for key in METADATA})
+            if tasks[i].get('_id') is not None:
+                self.rows[tasks[i]['_id']] = row
+
+        if self.size >= self.ivf_threshold and (self.centroids is None or self.size >= 2 * self.trained_size):
+            self.train()
+        elif self.centroids is not None:
+            labels = np.argmax(vectors @ self.centroids.T, axis=1)
+            for label in np.unique(labels):
+                self.lists[label] = np.concatenate([self.lists[label], start + np.flatnonzero(labels == label)])
+        return len(new)
+
+    def train(self):
+        from sklearn.cluster import MiniBatchKMeans
+        vectors = self.vectors[:self.size]
+        n_lists = max(1, int(np.sqrt(self.size)))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=self.seed, n_init=3, batch_size=4096).fit(vectors)
+        self.centroids = normalize_rows(kmeans.cluster_centers_)
+
+        labels = np.argmax(vectors @ self.centroids.T, axis=1)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+        self.trained_size = self.size
+
+    # The k most similar tasks with their similarity, most similar first
+    def search(self, vector, k=5):
+        if self.size == 0:
+            return []
+        query = normalize_rows(vector)[0]
+        if self.centroids is None:
+            rows = np.arange(self.size)
+        else:
+            n_probe = min(self.n_probe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+            rows = np.concatenate([self.lists[i] for i in probe])
+        if len(rows) == 0: # Every probed list is empty
+            return []
+
+        scores = self.vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [{**self.tasks[rows[i]], 'similarity': float(scores[i])} for i in top]
+
+# PCA-reduced BERT embeddings of raw tasks (script1 output) with the transforms stored in the pipeline
+def task_vectors(tasks, pipeline):
+    defaults = {'comments': [], 'title': '', 'body': '', 'commitMessages': ''}
+    df = extract_comment_bodies(pd.DataFrame([{**defaults, **task} for task in tasks]))
+    df = get_bert_embeddings(df[list(defaults)], pipeline=pipeline, fit=False, **pipeline['bert'])
+    return df.filter(regex=r'^pca_\d+$').to_numpy(dtype=np.float32)
+
+def load_task_index(path=TASK_INDEX_FILE):
+    return joblib.load(path)
+
+def save_task_index(index, path=TASK_INDEX_FILE):
+    joblib.dump(index, path)
@@ -0,0 +1,165 @@
+import numpy as np
+from .utils import preprocess_text
+
+# Columnar tables of the tasks and commits that go through script1. The stages work on row indices: the lists of a task
+# (assignees, date windows, candidate and matched commits) are slices of flat arrays given by offsets, the llm answers
+# are joined back to rows by index (tasks with the same title all get the answer of their title) and the tasks are only
+# turned into today's dicts by to_records at the end. Times are int64 milliseconds since the epoch
+HOUR = 3600 * 1000
+FLOW = ["Backlog", "Sprint Planning", "In Progress", "Delivered", "Accepted"]
+
+# '2023-01-05T10:00:00.000Z' -> milliseconds, numpy parses the ISO strings without the Z
+def parse_times(values):
+    return np.array([value[:-1] for value in values], dtype='datetime64[ms]').astype(np.int64)
+
+# Offsets of a list of lists, row i is flat[offsets[i]:offsets[i + 1]]
+def list_offsets(lists):
+    return np.concatenate([[0], np.cumsum([len(values) for values in lists])]).astype(np.int64)
+
+# Rows of a flat array of the given rows of a list of lists (start and end offsets)
+def take_slices(flat, offsets, rows):
+    starts, ends = offsets[rows], offsets[np.asarray(rows) + 1]
+    index = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)] or [np.zeros(0, dtype=np.int64)])
+    return flat[index], list_offsets([range(start, end) for start, end in zip(starts, ends)])
+
+class CommitTable:
+    def __init__(self, commits):
+        self.commits = commits
+        self.ids = np.array([commit['_id'] for commit in commits], dtype=object)
+        self.times = parse_times([commit['createdAt'] for commit in commits])
+        self.order = np.argsort(self.times, kind='stable')
+        self.sorted_times = self.times[self.order]
+        self.records = [None] * len(commits) # Exported dicts, the message is preprocessed once however many tasks it is a candidate of
+
+    def __len__(self):
+        return len(self.ids)
+
+    # The commit like filter_task_data of add_commits_to_tasks gives it
+    def record(self, index):
+        if self.records[index] is None:
+            commit = self.commits[index]
+            self.records[index] = {
+                "commitId": commit['_id'],
+                "message": preprocess_text(commit["message"]),
+                "files": [{key: value for key, value in file.items() if key != "_id"} for file in commit["files"]]
+            }
+        return self.records[index]
+
+class TaskTable:
+    def __init__(self, tasks, columns=None):
+        self.tasks = tasks # The original dicts, only read by keywords and to_records
+        if columns is not None:
+            self.__dict__.update(columns)
+            return
+
+        n_tasks = len(tasks)
+        self.ids = np.array([task.get('_id') for task in tasks], dtype=object)
+        self.titles = [task.get('title', '') for task in tasks]
+        self.created = parse_times([task['createdAt'] for task in tasks])
+
+        self.assignee_names = sorted({assignee for task in tasks for assignee in task.get('assignees', [])})
+        assignee_code = {name: i for i, name in enumerate(self.assignee_names)}
+        assignees = [[assignee_code[assignee] for assignee in task.get('assignees', [])] for task in tasks]
+        self.assignee_codes = np.array([code for codes in assignees for code in codes], dtype=np.int32)
+        self.assignee_offsets = list_offsets(assignees)
+
+        # Events that open a commit window (like extract_dates): every points burned edit and the status edits that move
+        # forward in FLOW. The task ends at the last status edit, or the one before it when the last one is Accepted
+        events, ends = [], []
+        for task in tasks:
+            status_edits, valid, last_status = task['statusEdits'], [], None
+            for edit in status_edits:
+                if last_status is None or (last_status in FLOW and edit.get('to') in FLOW and FLOW.index(last_status) < FLOW.index(edit.get('to'))):
+                    valid.append(edit)
+                    last_status = edit.get('to')
+            events.append([edit['createdAt'] for edit in task.get('pointsBurnedEdits', []) + valid if 'createdAt' in edit])
+            ends.append(status_edits[-2]['createdAt'] if status_edits[-1]['to'] == "Accepted" and len(status_edits) > 1 else status_edits[-1]['createdAt'])
+        self.event_times = parse_times([time for task_events in events for time in task_events])
+        self.event_offsets = list_offsets(events)
+        self.end = parse_times(ends) + 3 * HOUR
+
+        self.categories = [[] for _ in range(n_tasks)]
+        self.focus_areas = [[] for _ in range(n_tasks)]
+        self.keyword_cache = [None] * n_tasks
+        self.commit_index, self.commit_offsets = None, None
+
+    def __len__(self):
+        return len(self.titles)
+
+    # New table with only the given rows (e.g. the code tasks), in that order
+    def take(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        pick = lambda values: [values[i] for i in rows]
+        assignee_codes, assignee_offsets = take_slices(self.assignee_codes, self.assignee_offsets, rows)
+        event_times, event_offsets = take_slices(self.event_times, self.event_offsets, rows)
+        commit_index, commit_offsets = take_slices(self.commit_index, self.commit_offsets, rows) if self.commit_index is not None else (None, None)
+        return TaskTable(pick(self.tasks), {
+            'ids': self.ids[rows], 'titles': pick(self.titles), 'created': self.created[rows], 'end': self.end[rows],
+            'assignee_names': self.assignee_names, 'assignee_codes': assignee_codes, 'assignee_offsets': assignee_offsets,
+            'event_times': event_times, 'event_offsets': event_offsets,
+            'categories': pick(self.categories), 'focus_areas': pick(self.focus_areas), 'keyword_cache': pick(self.keyword_cache),
+            'commit_index': commit_index, 'commit_offsets': commit_offsets
+        })
+
+    def assignees(self, row):
+        return [self.assignee_names[code] for code in self.assignee_codes[self.assignee_offsets[row]:self.assignee_offsets[row + 1]]]
+
+    # normalized title -> rows with that title, in the order of the first row of every title
+    def rows_by_title(self, normalize=lambda title: title):
+        rows = {}
+        for row, title in enumerate(self.titles):
+            rows.setdefault(normalize(title), []).append(row)
+        return rows
+
+    def keywords(self, row):
+        if self.keyword_cache[row] is None:
+            task = self.tasks[row]
+            comments_text = " ".join(comment['body'] for comment in task.get('comments', []) if 'body' in comment)
+            self.keyword_cache[row] = preprocess_text(f"{task.get('body', '')} {comments_text}")
+        return self.keyword_cache[row]
+
+    # Date windows of every event (24 hours before to 3 hours after it) that start inside the life of the task, one that
+    # starts before the task was created is cut at its creation like extract_dates does. Returns (row, start, end) arrays
+    def date_ranges(self):
+        rows = np.repeat(np.arange(len(self)), np.diff(self.event_offsets))
+        starts, ends = self.event_times - 24 * HOUR, self.event_times + 3 * HOUR
+        created, end = self.created[rows], self.end[rows]
+        cut = (starts < created) & (created < ends)
+        keep = cut | ((created <= starts) & (starts <= end))
+        return rows[keep], np.where(cut, created, starts)[keep], ends[keep]
+
+    # Candidate commits of every task: the commits inside any of its date windows, in their original order. Every window is
+    # a range of the commits sorted by time, the (task, commit) pairs of all the ranges are expanded at once and deduplicated
+    def match_commits(self, commit_table):
+        rows, starts, ends = self.date_ranges()
+        low = np.searchsorted(commit_table.sorted_times, starts, side='left')
+        lengths = np.searchsorted(commit_table.sorted_times, ends, side='right') - low
+        position = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(low, lengths)
+        pairs = np.sort(np.repeat(rows, lengths) * len(commit_table) + commit_table.order[position])
+        pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])] if len(pairs) else pairs # Sorting and masking is much faster than np.unique here
+
+        self.commit_index = pairs % max(len(commit_table), 1)
+        self.commit_offsets = np.searchsorted(pairs // max(len(commit_table), 1), np.arange(len(self) + 1)).astype(np.int64)
+        return self
+
+    # Keep only the given commits of every row (e.g. the ones the llm matched), commit_lists has one list per row
+    def set_commits(self, commit_lists):
+        self.commit_index = np.concatenate([np.asarray(commits, dtype=np.int64) for commits in commit_lists] or [np.zeros(0, dtype=np.int64)])
+        self.commit_offsets = list_offsets(commit_lists)
+
+    def commits(self, row):
+        return self.commit_index[self.commit_offsets[row]:self.commit_offsets[row + 1]]
+
+    # The task in the format of add_commits_to_tasks, as the commit queries and the ranking take it
+    def query_record(self, row, commit_table):
+        return {"keywords": self.keywords(row), "title": self.titles[row], "commits": [commit_table.record(i) for i in self.commits(row).tolist()]}
+
+    # Today's dicts: the original task with categories, focus_areas and the matched commits
+    def to_records(self, commit_table=None):
+        records = []
+        for row, task in enumerate(self.tasks):
+            record = {**task, 'categories': self.categories[row], 'focus_areas': self.focus_areas[row]}
+            if self.commit_index is not None and commit_table is not None:
+                record['commits'] = [commit_table.record(i) for i in self.commits(row).tolist()]
+            records.append(record)
+        return records
@@ -2,9 +2,15 @@ from datetime import datetime, timedelta
 import json
 import re
 from collections import Counter
-import spacy
 import os
-nlp = spacy.load('en_core_web_sm')
+from functools import lru_cache
+from .sync import synced_file
+
+# spaCy and its model take seconds to load, so they are loaded the first time text is preprocessed and not on import
+@lru_cache(maxsize=1)
+def load_nlp():
+    import spacy
+    return spacy.load('en_core_web_sm')
 
 def load_json_file(filename):
     path = '' # Place the main folder of your data
@@ -13,17 +19,20 @@ def load_json_file(filename):
 
 # Function that returns the commits of an author. You can choose an author to get only his commits
 def get_commits(author=''):
-    commits = load_json_file('') # Place the data file in that main folder for commits
+    commits = load_json_file(synced_file('commits') or '') # data/commits.json when using sync_exports, else place the data file in that main folder for commits
     if author:
         return [commit for commit in commits if commit.get('author') == author]
     return commits
 
 # Function that returns the tasks of an author. You can choose an author to get only his tasks
-# Remove statusEdits = []
-def get_tasks(assignee_id=''):
-    tasks = load_json_file('') # Place the data file in that main folder for tasks
+# Remove statusEdits = []. With ids (e.g. the changed ids of sync_exports) only those tasks are returned
+def get_tasks(assignee_id='', ids=None):
+    tasks = load_json_file(synced_file('tasks') or '') # data/tasks.json when using sync_exports, else place the data file in that main folder for tasks
     
     cleaned_tasks = [task for task in tasks if task.get('statusEdits')]
+    if ids is not None:
+        ids = set(ids)
+        cleaned_tasks = [task for task in cleaned_tasks if task['_id'] in ids]
 
     return [task for task in cleaned_tasks if assignee_id in task.get('assignees', [])] if assignee_id else cleaned_tasks
 
@@ -35,7 +44,7 @@ def preprocess_text(text, max_words=20):
     cleaned_text = re.sub(r'\s{2,}', ' ', cleaned_text)
     
     # Use spaCy for tokenization and stopword removal
-    doc = nlp(cleaned_text)
+    doc = load_nlp()(cleaned_text)
     tokens = [token.text for token in doc if not token.is_stop and token.is_alpha]
     
     # Extract the most common words